@@ -1,41 +1,341 @@
+import bisect
+import contextlib
+import glob
+import hashlib
+import io
+import json
 import os
 import sys
-import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from asm2mca import formatMCA, getFirstAffectedCell, getMCA, processTokens, tokenizeLine
+from mca2mc import encodeRecord, formatMC
+from mc2mcb import packMCB
+from vsc import processCommandLine
+
+# Build cache: results of assembly kept in files named by a hash of asm code
+# and of the assembler itself, so any change of the assembler starts a new
+# cache. The least recently used files (by modification time, updated on
+# every hit) are removed when the cache grows over its size.
+assemblerModules = ["asm2mc.py", "asm2mca.py", "mca2mc.py", "mc2mcb.py", "instructions.py"]
+cacheDir = os.environ.get("VSC_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "vsc"))
+cacheSize = 64 * 1024 * 1024
+try:
+    cacheSize = int(os.environ.get("VSC_CACHE_SIZE", cacheSize))
+except ValueError: # keep the default size
+    pass
+assemblerVersion = None
+
+
+def assemble(text, previous=None):
+    # asm -> mca -> mc in the current process, without files.
+    # Returns dictionary with lists of mca and mc records
+    # (see asm2mca and mca2mc) and symbols {label: address}
+    # or None if asm code cannot be converted.
+    #
+    # previous is the result of assemble for an earlier version of text,
+    # for example before the last keystroke in an editor. Only lines which
+    # differ from it are tokenized again. Sizes of cells before the first
+    # edited line are not relaxed again, unless they depend on labels placed
+    # after it (see getFirstAffectedCell), and their records are not encoded
+    # again, unless they use a label which has moved. The result is the same
+    # as without previous, except that warnings about duplicated addresses
+    # are not repeated for reused records. Keys lines, tokens (of every line),
+    # sizes (of every cell) and mcEnds (number of mc records after every
+    # mca record) are kept for the next call.
+    lines = text.splitlines(keepends=True)
+    oldLines = previous["lines"] if previous else []
+    oldTokens = previous["tokens"] if previous else []
+    n = min(len(lines), len(oldLines))
+    begin = 0
+    while begin < n and lines[begin] == oldLines[begin]:
+        begin += 1
+    end = 0
+    while end < n - begin and lines[-1-end] == oldLines[-1-end]:
+        end += 1
+
+    tokens = (oldTokens[:begin] + [tokenizeLine(l) for l in lines[begin:len(lines)-end]]
+              + oldTokens[len(oldTokens)-end:])
+    flat = [t for lineTokens in tokens for t in lineTokens]
+    # Source line number of every cell, cells are all tokens except directives
+    cellLines = [j+1 for j, lineTokens in enumerate(tokens) for t in lineTokens
+                 if t is not None and "directive" not in t]
+    fixed = 0
+    if previous:
+        editCell = bisect.bisect_right(cellLines, begin)
+        oldFlat = [t for lineTokens in oldTokens for t in lineTokens]
+        fixed = getFirstAffectedCell(flat, editCell, oldFlat)
+
+    result = processTokens(iter(flat), previous["sizes"][:fixed] if fixed else ())
+    if result is None:
+        return None
+    memory, symbols = result
+    cells = [m for m in memory if m["value"] != "NOP"]
+    sizes = [m.get("bytes", 1) for m in cells]
+
+    # Every cell is one mca record
+    mca = []
+    mc = []
+    mcEnds = []
+    addresses = {}
+    for i, m in enumerate(cells):
+        label = m.get("operand_label", m.get("data_label"))
+        if i < fixed and (label is None or symbols[label] == previous["symbols"].get(label)):
+            mca.append(previous["mca"][i])
+            encoded = previous["mc"][previous["mcEnds"][i-1] if i else 0:previous["mcEnds"][i]]
+            for r in encoded:
+                addresses[r["address"]] = 1
+        else:
+            mca.extend(getMCA([m]))
+            encoded = encodeRecord(mca[-1], addresses)
+            if encoded is None:
+                print(f"Cannot convert line {cellLines[i]}")
+                return None
+        mc.extend(encoded)
+        mcEnds.append(len(mc))
+
+    return {"mca": mca, "mc": mc, "symbols": symbols,
+            "lines": lines, "tokens": tokens, "sizes": sizes, "mcEnds": mcEnds}
+
+
+def getAssemblerVersion():
+    global assemblerVersion
+    if assemblerVersion is None:
+        h = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in assemblerModules:
+            with open(os.path.join(directory, name), "rb") as file:
+                h.update(file.read())
+        assemblerVersion = h.hexdigest()
+    return assemblerVersion
+
+
+def getCacheKey(source):
+    return hashlib.sha256(getAssemblerVersion().encode() + b"\0" + source).hexdigest()
+
+
+def readCache(key):
+    # Returns the cached build or None
+    if not cacheDir:
+        return None
+    path = os.path.join(cacheDir, f"{key}.json")
+    try:
+        with open(path, encoding="utf8") as file:
+            build = json.load(file)
+        os.utime(path)
+    except (OSError, ValueError):
+        return None
+    return build
+
+
+def writeCache(key, build):
+    if not cacheDir:
+        return
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        path = os.path.join(cacheDir, f"{key}.json")
+        # Other processes may read the file at the same time
+        temporaryPath = f"{path}.{os.getpid()}.tmp"
+        with open(temporaryPath, "w", encoding="utf8") as file:
+            json.dump(build, file)
+        os.replace(temporaryPath, path)
+        evictCache()
+    except OSError as e:
+        print(f"Warning: cannot write build cache: {e}")
+
+
+def evictCache():
+    entries = []
+    for entry in os.scandir(cacheDir):
+        if entry.name.endswith(".json"):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError: # removed by another process
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= cacheSize:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+        total -= size
+
+
+def build(source):
+    # Returns {"mca", "mc" (texts of files), "mcb" (hex of bytes or None),
+    # "words", "symbols", "messages"} or None if source cannot be converted.
+    # Messages printed by the assembler are kept, so they are printed the
+    # same way when the build comes from the cache.
+    key = getCacheKey(source)
+    result = readCache(key)
+    if result is not None:
+        print(result["messages"], end="")
+        return result
+
+    try:
+        text = source.decode("utf8")
+    except UnicodeDecodeError as e:
+        print(f"File is not UTF-8 text: {e}")
+        return None
+
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages):
+        assembled = assemble(text)
+        mcb = packMCB(assembled["mc"], assembled["symbols"]) if assembled else None
+    print(messages.getvalue(), end="")
+    if assembled is None:
+        return None
+
+    result = {"mca": "\n".join(formatMCA(r) for r in assembled["mca"]),
+              "mc": "\n".join(formatMC(r) for r in assembled["mc"]),
+              "mcb": mcb.hex() if mcb is not None else None,
+              "words": len(assembled["mc"]), "symbols": len(assembled["symbols"]),
+              "messages": messages.getvalue()}
+    writeCache(key, result)
+    return result
+
 
 def execute_commands(base_name):
     asm_path = f"{base_name}.asm"
     mca_path = f"{sys.argv[2]}.mca" if len(sys.argv) == 3 else f"{base_name}.mca"
     mc_path = f"{sys.argv[2]}.mc" if len(sys.argv) == 3 else f"{base_name}.mc"
+    mcb_path = f"{mc_path}b"
 
     if not os.path.isfile(asm_path):
         print(f"Error: The file '{asm_path}' does not exist.")
         return
 
-    # | tail -n +15
-    def process_output(output, file_path):
-        lines = output.splitlines()
-        processed_output = "\n".join(lines[14:])
-        print(processed_output)
-        with open(file_path, 'w') as file:
-            file.write(processed_output)
+    with open(asm_path, "rb") as file:
+        result = build(file.read())
+
+    if result is None:
+        print(f"Error: The file '{asm_path}' cannot be converted.")
+        return
+
+    writeOutputs(result, mca_path, mc_path, mcb_path)
 
-    # Execute the first command (asm2mca.py) and process its output
     print(f"{mca_path}:")
-    command1 = [sys.executable, 'asm2mca.py', asm_path]
-    result1 = subprocess.run(command1, capture_output=True, text=True)
-    process_output(result1.stdout, mca_path)
+    print(result["mca"])
 
     print()
-    
-    # Execute the second command (mca2mc.py) and process its output
+
     print(f"{mc_path}:")
-    command2 = [sys.executable, 'mca2mc.py', mca_path]
-    result2 = subprocess.run(command2, capture_output=True, text=True)
-    process_output(result2.stdout, mc_path)
+    print(result["mc"])
+
+    if result["mcb"] is not None:
+        print()
+        print(f"{mcb_path}: {result['words']} words, {result['symbols']} symbols")
+
+
+def writeOutputs(result, mca_path, mc_path, mcb_path):
+    with open(mca_path, 'w') as file:
+        file.write(result["mca"])
+    with open(mc_path, 'w') as file:
+        file.write(result["mc"])
+    if result["mcb"] is not None:
+        with open(mcb_path, "wb") as file:
+            file.write(bytes.fromhex(result["mcb"]))
+
+
+def getPaths(args):
+    # Every argument is an .asm file, a directory (searched recursively)
+    # or a glob pattern, also for shells which don't expand patterns.
+    paths = []
+    for a in args:
+        if os.path.isdir(a):
+            for directory, _, names in sorted(os.walk(a)):
+                paths += [os.path.join(directory, n) for n in sorted(names) if n.endswith(".asm")]
+        elif glob.has_magic(a):
+            paths += sorted(glob.glob(a, recursive=True))
+        else:
+            paths.append(a)
+    return paths
+
+
+def buildFile(asm_path):
+    # Writes .mca, .mc and .mcb next to the source. Returns {"path",
+    # "ok", "seconds", "messages"}, messages are not printed, because
+    # they would mix with messages of other files.
+    start = time.perf_counter()
+    base_name = asm_path.removesuffix(".asm")
+    messages = io.StringIO()
+    with contextlib.redirect_stdout(messages):
+        try:
+            with open(asm_path, "rb") as file:
+                result = build(file.read())
+            if result is not None:
+                writeOutputs(result, f"{base_name}.mca", f"{base_name}.mc", f"{base_name}.mcb")
+        except OSError as e:
+            print(e)
+            result = None
+    return {"path": asm_path, "ok": result is not None,
+            "seconds": time.perf_counter() - start,
+            "messages": messages.getvalue().splitlines()}
+
+
+def buildFiles(paths, jobs=None):
+    # Files are assembled in a pool of processes, one process per core
+    # unless jobs is given. Results are yielded in the order of paths.
+    n = len(paths)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        yield from executor.map(buildFile, paths,
+                                chunksize=max(1, n // (4 * (jobs or os.cpu_count() or 1))))
+
+
+def printUsage():
+    text = \
+'''
+Usage: py asm2mc.py <base_name> [output_file]
+       py asm2mc.py -path PATH... [-jobs N]
+
+<base_name>          - assemble <base_name>.asm into .mca, .mc and .mcb files,
+                       named after output_file if it is given, and print them
+-path PATH...        - .asm files, directories with them (searched
+                       recursively) or glob patterns, example: "en/**/*.asm";
+                       every file is assembled into .mca, .mc and .mcb files
+                       next to it
+-jobs N              - number of processes (default: number of cores)
+
+With -path every file is printed as one line with its status (ok, FAILED)
+and time of assembly, followed by messages of the assembler. The exit
+status is 1 if any file cannot be converted.
+
+Results are kept in a build cache, so unchanged files are not assembled again.
+VSC_CACHE            - directory of the cache (default: ~/.cache/vsc,
+                       empty: no cache)
+VSC_CACHE_SIZE       - maximal size of the cache in bytes (default: 64 MB)
+'''
+
+    print(text)
+
+
+def executeBatch(args):
+    commandsDict = processCommandLine(args, ["-jobs", "-path"])
+    jobs = commandsDict.get('-jobs', ["0"])
+    if not commandsDict.get('-path') or len(jobs) != 1 or not jobs[0].isnumeric():
+        printUsage()
+        return 1
+
+    paths = getPaths(commandsDict['-path'])
+    start = time.perf_counter()
+    failed = 0
+    for r in buildFiles(paths, int(jobs[0]) or None):
+        failed += not r["ok"]
+        print(f"{'ok' if r['ok'] else 'FAILED':6} {r['seconds']:7.3f} s  {r['path']}")
+        for message in r["messages"]:
+            print(f"    {message}")
+    print(f"{len(paths)} files, {len(paths) - failed} ok, {failed} failed "
+          f"in {time.perf_counter() - start:.3f} s")
+    return 1 if failed or not paths else 0
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1].startswith("-"):
+        sys.exit(executeBatch(sys.argv[1:]))
+
     if len(sys.argv) not in {2, 3}:
-        print("Usage: py asm2mc.py <base_name> [output_file]")
+        printUsage()
         sys.exit(1)
 
     base_name = sys.argv[1].removesuffix(".asm")
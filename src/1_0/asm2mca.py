@@ -1,84 +1,18 @@
 import sys
 import re
 
+from instructions import branchMnemonics, checkIfFit, instructionsByForm, instructionsByMnemonic
 
-def checkIfFit(operand, condition):
-  o = int(operand)
-  # Integer without a sign
-  if condition in {"aa", "aaa", "aaaa", "aaaaa"}:
-    if o < 0:
-      return None
-    d = len(condition)
-    s = f"{o:0{d}d}"
-    if len(s)>d:
-      return None
-    return s
-  # Integer with a sign
-  elif condition in {"ss", "sssss"}:
-    d = len(condition)-1
-    s = f"{abs(o):0{d}d}"
-    if len(s)>d:
-      return None
-    if o>=0:
-      s = "0" + s
-    else:
-      s = "1" + s
-    return s
-  else:
-    return None
-
-
-def getInstructions():
-  instructions = [
-    {"mnemonic": "HLT",  "addressing": "noOperand", "opcode": "00000", "condition": None},
-    {"mnemonic": "CPA",  "addressing": "direct",    "opcode": "1",     "condition": "aaaa"},
-    {"mnemonic": "CPA",  "addressing": "immediate", "opcode": "921",   "condition": "ss"},
-    {"mnemonic": "CPA",  "addressing": "immediate", "opcode": "93100", "condition": "sssss"},
-    {"mnemonic": "CPA",  "addressing": "indirect",  "opcode": "941",   "condition": "aa"},
-    {"mnemonic": "CPA",  "addressing": "indirect",  "opcode": "95100", "condition": "aaaaa"},
-    {"mnemonic": "STO",  "addressing": "direct",    "opcode": "2",     "condition": "aaaa"},
-    {"mnemonic": "STO",  "addressing": "indirect",  "opcode": "942",   "condition": "aa"},
-    {"mnemonic": "STO",  "addressing": "indirect",  "opcode": "95200", "condition": "aaaaa"},
-    {"mnemonic": "ADD",  "addressing": "direct",    "opcode": "3",     "condition": "aaaa"},
-    {"mnemonic": "ADD",  "addressing": "immediate", "opcode": "923",   "condition": "ss"},
-    {"mnemonic": "ADD",  "addressing": "immediate", "opcode": "93300", "condition": "sssss"},
-    {"mnemonic": "ADD",  "addressing": "indirect",  "opcode": "943",   "condition": "aa"},
-    {"mnemonic": "ADD",  "addressing": "indirect",  "opcode": "95300", "condition": "aaaaa"},
-    {"mnemonic": "SUB",  "addressing": "direct",     "opcode": "4",     "condition": "aaaa"},
-    {"mnemonic": "SUB",  "addressing": "immediate",  "opcode": "924",   "condition": "ss"},
-    {"mnemonic": "SUB",  "addressing": "immediate",  "opcode": "93400", "condition": "sssss"},
-    {"mnemonic": "SUB",  "addressing": "indirect",   "opcode": "945",   "condition": "aa"},
-    {"mnemonic": "SUB",  "addressing": "indirect",   "opcode": "95500", "condition": "aaaaa"},
-    {"mnemonic": "MUL",  "addressing": "direct",     "opcode": "5",     "condition": "aaaa"},
-    {"mnemonic": "MUL",  "addressing": "immediate",  "opcode": "925",   "condition": "ss"},
-    {"mnemonic": "MUL",  "addressing": "immediate",  "opcode": "93500", "condition": "sssss"},
-    {"mnemonic": "MUL",  "addressing": "indirect",   "opcode": "945",   "condition": "aa"},
-    {"mnemonic": "MUL",  "addressing": "indirect",   "opcode": "95500", "condition": "aaaaa"},
-    {"mnemonic": "BRA",  "addressing": "immediate",  "opcode": "6",     "condition": "aaaa"},
-    {"mnemonic": "BRN",  "addressing": "immediate",  "opcode": "7",     "condition": "aaaa"},
-    {"mnemonic": "BRNF", "addressing": "immediate",  "opcode": "907",   "condition": "aa"},
-    {"mnemonic": "BRZ",  "addressing": "immediate",  "opcode": "8",     "condition": "aaaa"},
-    {"mnemonic": "BRZF", "addressing": "immediate",  "opcode": "908",   "condition": "aa"},
-    {"mnemonic": "INC",  "addressing": "direct",     "opcode": "01",    "condition": "aaa"},
-    {"mnemonic": "DEC",  "addressing": "direct",     "opcode": "02",    "condition": "aaa"},
-    {"mnemonic": "PUSH", "addressing": "noOperand",  "opcode": "03000", "condition": None},
-    {"mnemonic": "PUSH", "addressing": "direct",     "opcode": "91030", "condition": "aaaaa"},
-    {"mnemonic": "PUSH", "addressing": "immediate",  "opcode": "93030", "condition": "sssss"},
-    {"mnemonic": "PUSH", "addressing": "indirect",   "opcode": "95030", "condition": "aaaaa"},
-    {"mnemonic": "POP",  "addressing": "noOperand",  "opcode": "04000", "condition": None},
-    {"mnemonic": "POP",  "addressing": "direct",     "opcode": "91040", "condition": "aaaaa"},
-    {"mnemonic": "POP",  "addressing": "indirect",   "opcode": "95040", "condition": "aaaaa"}
-  ]
-  
-  return instructions
+# One byte forms of instructions, (mnemonic, addressing) -> conditions
+shortConditions = {}
+for key, forms in instructionsByForm.items():
+  conditions = [ins["condition"] for ins in forms if ins["condition"] and len(ins["condition"]) < 5]
+  if conditions:
+    shortConditions[key] = conditions
 
 
 def isInstruction(sequence):
-  instructions = getInstructions()
-  for i in instructions:
-    if i["mnemonic"] == sequence:
-      return True
-  return False
+  return sequence in instructionsByMnemonic
 
 
 def intToAddress(a):
@@ -119,9 +53,8 @@ def isNumber(sequence):
 
 
 def normalizeLines(lines):
-  linesNew = []
-  labels = []
-  
+  # Generator of normalized lines, every line (except directives)
+  # has a label part, possibly empty: "label : instruction ; comment".
   for l in lines:
     # There may be at most one ":" and one ";" character in every line
     # todo
@@ -141,7 +74,7 @@ def normalizeLines(lines):
     if len(ln) > 0:
       # If line starts with "." this is directive. Do nothing with this.
       if ln.startswith("."):
-        linesNew.append(ln)
+        yield ln
       else: # Make sure that every line has unique label
         # Add or modify label i every line.
         # Check if label is present.
@@ -151,7 +84,6 @@ def normalizeLines(lines):
           # Check if label exists.
           if len(ln)>1:
             label = ln[0].strip()
-            labels.append(label)
             ln = label + " : " + ln[1].strip()
           else: # There is only ":" without any label.
             ln = " : " + ln[0].strip()
@@ -159,19 +91,15 @@ def normalizeLines(lines):
           ln = " : " + ln
           
         if comment == "":
-          linesNew.append(ln)
+          yield ln
         else:
-          linesNew.append(ln + " ; " + comment)
-
-  return (linesNew, labels)
+          yield ln + " ; " + comment
 
 
-def getTokens(lines, labels):
-  def msgError(instruction, line):
-    print(f"Unsupported instruction format: {instruction}")
-    print(f"in line: {line}")
-      
-  tokens = []
+def getTokens(lines):
+  # Generator of tokens, one list of tokens for every line.
+  # Labels used as operands or data are not known yet, they are checked
+  # by processTokens. Yields None and stops if a line is incorrect.
   for line in lines:
     t = []
     ln = line.strip()
@@ -188,19 +116,21 @@ def getTokens(lines, labels):
     if ln[0] == ".data":
       if len(ln) > 1 and ln[1].isdigit():
         t = {"type": "directive", "value": ln[1], "subtype": "data"}
-        tokens.append([t])
+        yield [t]
         continue
       else:
         print(f"Incomplete directive in line: {line}")
-        return None
+        yield None
+        return
     elif ln[0] == ".code":
       if len(ln) > 1 and ln[1].isdigit():
         t = {"type": "directive", "value": ln[1], "subtype": "code"}
-        tokens.append([t])
+        yield [t]
         continue
       else:
         print(f"Incomplete directive in line: {line}")
-        return None
+        yield None
+        return
     
     # Line is not directive - proceed
     # Divide line into three sections: label, instruction and comment
@@ -256,17 +186,15 @@ def getTokens(lines, labels):
       v = isNumber(mnemonic)
       if v["result"] == "error":
         print(v["value"])
-        return None
+        yield None
+        return
       v = v["value"]
       if isInstruction(mnemonic):
         t.append({"type": "instruction", "value": mnemonic})
       elif v is not None:
         t.append({"type": "data", "value": v, "subtype": "number"})
-      elif mnemonic in labels:
-        t.append({"type": "data_label", "value": mnemonic})
       else:
-        msgError(instruction, line)
-        return None
+        t.append({"type": "data_label", "value": mnemonic})
     elif lIns == 2 or lIns == 4:
       if lIns == 2:
         mnemonic = instruction[0]
@@ -280,182 +208,229 @@ def getTokens(lines, labels):
         elif instruction[1] == "(" and instruction[3] == ")":
           addressing = "immediate"
           
-      if mnemonic in {"BRA", "BRN", "BRNF", "BRZ", "BRZF"}:
+      if mnemonic in branchMnemonics:
           addressing = "immediate"
 
       if isInstruction(mnemonic):
-        if operand in labels:
+        v = isNumber(operand)
+        if v["result"] == "ok" and v["value"] is not None:
+          v = v["value"]
+          t.append({"type": "instruction", "value": mnemonic, "addressing": addressing})
+          t.append({"type": "operand_number", "value": v})
+        elif v["result"] == "ok": # Not a number, so it must be a label
           t.append({"type": "instruction", "value": mnemonic, "addressing": addressing})
           t.append({"type": "operand_label", "value": operand})
-          #tokens.append(t)
         else:
-          v = isNumber(operand)
-          if v["result"] == "ok" and v["value"] is not None:
-            v = v["value"]
-            #t = []
-            t.append({"type": "instruction", "value": mnemonic, "addressing": addressing})
-            t.append({"type": "operand_number", "value": v})
-            #tokens.append(t)
-          else:
-            print("Something is wrong")
-            return None
+          print("Something is wrong")
+          yield None
+          return
       else:
         print(f"{mnemonic} is not mnemonic in line: {line}")
-        return None
+        yield None
+        return
     else:
       print(f"Unsupported instruction format: {instruction}")
       print(f"in line: {line}")
-      return None
+      yield None
+      return
     
-    tokens.append(t)
-  
-  return tokens
+    yield t
 
 
 def reorganizeTokens(tokens):
-  tokensAsDictionaries = []
+  # Generator of tokens of every line as a dictionary type -> token.
+  # None (incorrect line) is passed through.
   for t in tokens:
+    if t is None:
+      yield None
+      return
+
     d = {}
     
     for tt in t:
       d[tt["type"]] = tt
       
-    tokensAsDictionaries.append(d)
-  
-  return tokensAsDictionaries
+    yield d
+
 
+def tokenizeLine(line):
+  # Tokens of one line of asm code (see reorganizeTokens): empty list
+  # for an empty line, [None] for an incorrect one.
+  return list(reorganizeTokens(getTokens(normalizeLines([line]))))
 
-def processTokens(tokens):
+
+def getLabelIndexes(tokens):
+  # label -> index of the cell with its last definition, the one used
+  # by processTokens. Cells are counted the same way as in processTokens.
+  labelIndexes = {}
+  n = 0
+  for t in tokens:
+    if t is None or "directive" in t:
+      continue
+    if "label" in t:
+      labelIndexes[t["label"]["value"]] = n
+    n += 1
+  return labelIndexes
+
+
+def getFirstAffectedCell(tokens, editCell, oldTokens=()):
+  # Sizes of cells before the returned index (at most editCell) don't depend
+  # on cells from editCell on, so their sizes and addresses are the same
+  # whatever follows. Only labels used by instructions which have a one byte
+  # form not suitable for every address (aa, aaa, ss) can change the size.
+  # Tokens are all tokens of the program, oldTokens those of the previous
+  # version, from which the sizes are taken. A label defined from editCell
+  # on in any of them is affected: if it is defined more than once, removing
+  # its last definition moves it to an earlier one.
+  labelIndexes = getLabelIndexes(tokens)
+  oldLabelIndexes = getLabelIndexes(oldTokens)
+  references = []
+  n = 0
+  for t in tokens:
+    if n >= editCell:
+      break
+    if t is None or "directive" in t:
+      continue
+    label = None
+    if "operand_label" in t:
+      instruction = t["instruction"]
+      conditions = shortConditions.get((instruction["value"], instruction["addressing"]), ["aaaa"])
+      if "aaaa" not in conditions:
+        label = t["operand_label"]["value"]
+    references.append(label)
+    n += 1
+
+  # The last index such that all references before it point before it
+  affected = 0
+  last = -1
+  for i, label in enumerate(references):
+    if last < i:
+      affected = i
+    if label is not None:
+      last = max(last, labelIndexes.get(label, editCell), oldLabelIndexes.get(label, -1))
+  if last < len(references):
+    affected = len(references)
+  return affected
+
+
+def processTokens(tokens, fixedSizes=()):
+  # Only this stage keeps the whole program, because addresses of labels
+  # and sizes of instructions depend on each other.
+  # fixedSizes are sizes (1 or 2) of the first cells known from the previous
+  # assembly, see getFirstAffectedCell; relaxation starts after them.
+  # Returns None if tokens contain an error or an unknown label.
   memory = []
-  labels = {}
-  a = None
+  labelIndexes = {} # label -> index in memory
+  blockStarts = {} # index in memory -> address defined by directive
   
-  # First pass: assume all instructiona are one byte but reserve 2 butes for each
+  # First pass: collect cells, assume all instructions with an operand are two bytes
   for t in tokens:
+    if t is None:
+      return None
     if "directive" in t: # At this moment directives only defines beginning of blocks
-      a = int(t["directive"]["value"])
-    elif "data" in t: # I have only data, so it must be located in a one memory cell
-      addr = intToAddress(a)
-      if "label" in t:
-        labels[t["label"]["value"]] = addr
-        memory.append({"address": addr, "value": t["data"]["value"], "label": t["label"]["value"]})
-      else:
-        memory.append({"address": addr, "value": t["data"]["value"]})
-      a += 1
+      blockStarts[len(memory)] = int(t["directive"]["value"])
+      continue
+
+    m = {}
+    if "label" in t:
+      m["label"] = t["label"]["value"]
+      labelIndexes[m["label"]] = len(memory)
+
+    if "data" in t: # I have only data, so it must be located in a one memory cell
+      m["value"] = t["data"]["value"]
     elif "data_label" in t: # I have only data, so it must be located in a one memory cell
-      addr = intToAddress(a)
-      if "label" in t:
-        labels[t["label"]["value"]] = addr
-      memory.append({"address": addr, "data_label": t["data_label"]["value"], "value": None})
-      a += 1
+      m["data_label"] = t["data_label"]["value"]
+      m["value"] = None
     elif "instruction" in t:
-      addr = intToAddress(a)
-      instruction = t["instruction"]["value"]
-      
-      if "label" in t:
-        label = t["label"]["value"]
-        labels[t["label"]["value"]] = addr
-      else:
-        label = None
+      m["value"] = t["instruction"]["value"]
       if "operand_label" in t:
-        operand_label = t["operand_label"]["value"]
-        addressing = t["instruction"]["addressing"]
-        if label:
-          memory.append({"address": addr, "value": instruction, "operand_label": operand_label, "operand": None, "addressing": addressing, "bytes": 2, "label": label})
-        else:
-          memory.append({"address": addr, "value": instruction, "operand_label": operand_label, "operand": None, "addressing": addressing, "bytes": 2})
-        a += 1
-        addr = intToAddress(a)
-        memory.append({"address": addr, "value": "NOP"})
-        a += 1
+        m["operand_label"] = t["operand_label"]["value"]
+        m["operand"] = None
+        m["addressing"] = t["instruction"]["addressing"]
+        m["bytes"] = 2
       elif "operand_number" in t:
         # If operand is exact number there is no need to gues instruction size
-        # But simpler is to "copy" solution for "operand_label"
-        operand_number = t["operand_number"]["value"]
-        addressing = t["instruction"]["addressing"]
-        if label:
-          memory.append({"address": addr, "value": instruction, "operand": operand_number, "addressing": addressing, "bytes": 2, "label": label})
-        else:
-          memory.append({"address": addr, "value": instruction, "operand": operand_number, "addressing": addressing, "bytes": 2})
-        a += 1
-        addr = intToAddress(a)
-        memory.append({"address": addr, "value": "NOP"})
-        a += 1
-      else:
-        if label:
-          memory.append({"address": addr, "value": instruction, "label": label})
-        else:
-          memory.append({"address": addr, "value": instruction})
-        a += 1
-  
-  # Second pass: iteratively try to remove NOPs
-  instructions = getInstructions()
-  for _ in range(len(memory)): # len(memory) is the upper limit of iterations
-    # Substitute all labels with numbers.
-    for m in memory:
-      if "data_label" in m:
-        m["value"] = labels[m["data_label"]]
-      elif "operand_label" in m:
-        m["operand"] = labels[m["operand_label"]]
-    # Check number of bytes for instructions.
-    # First instruction with reduced NOP stop searching
-    # and force to move all subsequent instructions
-    # and recalculate all addresses for labels.
-    
-    relocate = False
-    relocationIndex = None
+        # but it is handled the same way as "operand_label"
+        m["operand"] = t["operand_number"]["value"]
+        m["addressing"] = t["instruction"]["addressing"]
+        m["bytes"] = 2
+    memory.append(m)
+
+  for m in memory:
+    label = m.get("operand_label", m.get("data_label"))
+    if label is not None and label not in labelIndexes:
+      print(f"Unknown label: {label}")
+      return None
+
+  def computeAddresses():
+    a = 0
     for i, m in enumerate(memory):
-      relocate = False
-      for ins in instructions:
-        if "value" in m and "addressing" in m:
-          if m["value"] == ins["mnemonic"] and m["addressing"] == ins["addressing"]:
-            condition = ins["condition"]
-          
-            if condition:
-              operand = m["operand"]
-              result = checkIfFit(operand, condition)
-              if result:
-                #print(f"Fit to {ins}")
-                if len(result)<5 and m["bytes"] == 2:
-                  #print("Relocate")
-                  m["bytes"] = 1
-                  relocate = True
-                  relocationIndex = i
-                  break
-      
-      if relocate == True:
-        break
-    
-    if relocate == False:
-      break
-    
-    # Do relocation.
-    #print(f"Start relocation form index {i} and instruction {m}")
-    memoryNew = memory[0:i+1]
-    for i in range(i+2,len(memory)):
-      e = memory[i]
-      a = int(e["address"])
-      a -= 1
-      addr = intToAddress(a)
-      e["address"] = addr
-      memoryNew.append(e)
-      
-    memory = memoryNew
-      
-    # Update all labels
-    for m in memory:
-      if "label" in m:
-        addr = m["address"]
-        label = m["label"]
-        if labels[label] != addr:
-          #print(f"Update label {label} to new value {addr}")
-          labels[label] = addr
+      if i in blockStarts:
+        a = blockStarts[i]
+      addresses[i] = a
+      a += m.get("bytes", 1)
+
+  begin = len(fixedSizes)
+  for i in range(begin):
+    if "bytes" in memory[i]:
+      memory[i]["bytes"] = fixedSizes[i]
+  addresses = [0] * len(memory)
+  computeAddresses()
+
+  # Second pass: shrink instructions which operand fits in one byte.
+  # Shrinking an instruction only moves cells to lower addresses, so
+  # an operand which fits once fits forever. Every sweep goes through
+  # memory once and moves following cells of the block as it goes;
+  # labels placed before the current cell already have their new address,
+  # labels placed after it still have the old (greater or equal) one.
+  # Sweeps are repeated until nothing changes.
+  relocate = True
+  while relocate:
+    relocate = False
+    a = addresses[begin-1] + memory[begin-1].get("bytes", 1) if begin else 0
+    for i in range(begin, len(memory)):
+      m = memory[i]
+      if i in blockStarts:
+        a = blockStarts[i]
+      addresses[i] = a
+
+      if m.get("bytes") == 2:
+        if "operand_label" in m:
+          operand = addresses[labelIndexes[m["operand_label"]]]
+        else:
+          operand = m["operand"]
+        for condition in shortConditions.get((m["value"], m["addressing"]), []):
+          if checkIfFit(operand, condition):
+            m["bytes"] = 1
+            relocate = True
+            break
+
+      a += m.get("bytes", 1)
+
+  # Substitute all labels with addresses.
+  computeAddresses()
+  labels = {}
+  for label, i in labelIndexes.items():
+    labels[label] = intToAddress(addresses[i])
+
+  memoryNew = []
+  for i, m in enumerate(memory):
+    m["address"] = intToAddress(addresses[i])
+    if "data_label" in m:
+      m["value"] = labels[m["data_label"]]
+    elif "operand_label" in m:
+      m["operand"] = labels[m["operand_label"]]
+    memoryNew.append(m)
+    if m.get("bytes") == 2:
+      memoryNew.append({"address": intToAddress(addresses[i]+1), "value": "NOP"})
    
-  return (memory, labels)
+  return (memoryNew, labels)
 
 
 def getMCA(memory):
-  newMemory = []
+  # Generator of mca records for memory returned by processTokens:
+  # {"address", "mnemonic", "operand", "addressing", "value", "comment"}.
+  # Instruction has mnemonic, data has value.
   for m in memory:
     addr = m["address"]
     value = m["value"]
@@ -463,40 +438,72 @@ def getMCA(memory):
       l = len(value)
       if l<5:
         value = "0"*(5-l) + value
-      newMemory.append(f"{addr} {value}")
+      yield {"address": addr, "mnemonic": None, "operand": None,
+             "addressing": None, "value": value, "comment": ""}
     else:
       if "operand" in m:
-        operand = m["operand"]  
-        addrMode = m["addressing"]
-        
-        if addrMode == "direct":
-          newMemory.append(f"{addr} {value} {operand}")
-        elif addrMode == "indirect":
-          newMemory.append(f"{addr} {value} [{operand}]")
-        elif addrMode == "immediate":
-          if value in {"BRA", "BRN", "BRNF", "BRZ", "BRZF"}:
-            newMemory.append(f"{addr} {value} {operand}")
-          else:
-            newMemory.append(f"{addr} {value} ({operand})")
+        yield {"address": addr, "mnemonic": value, "operand": m["operand"],
+               "addressing": m["addressing"], "value": None, "comment": ""}
       else:
         if value != "NOP":  
-          newMemory.append(f"{addr} {value}")
-      
-  return newMemory
-
-
-def asm2mca(path):
-  addresses = {}
-  with open(path, encoding="utf8") as fileSrc:
-    lines = fileSrc.readlines()
-    lines, labels = normalizeLines(lines)
-    tokens = getTokens(lines, labels)
-    tokens = reorganizeTokens(tokens)
-    memory, labels = processTokens(tokens)
-    memory = getMCA(memory)
-    
-    for m in memory:
-      print(m)
+          yield {"address": addr, "mnemonic": value, "operand": None,
+                 "addressing": "noOperand", "value": None, "comment": ""}
+
+
+def formatMCA(record):
+  addr = record["address"]
+  value = record["mnemonic"]
+  operand = record["operand"]
+  addrMode = record["addressing"]
+
+  if value is None:
+    return f"{addr} {record['value']}"
+  elif operand is None:
+    return f"{addr} {value}"
+  elif addrMode == "indirect":
+    return f"{addr} {value} [{operand}]"
+  elif addrMode == "immediate" and value not in branchMnemonics:
+    return f"{addr} {value} ({operand})"
+  return f"{addr} {value} {operand}"
+
+
+def readSource(source):
+  # Source is a path to a file or an iterable of lines.
+  if isinstance(source, str):
+    with open(source, encoding="utf8") as fileSrc:
+      yield from fileSrc
+  else:
+    yield from source
+
+
+def generateMCA(source, symbols=None):
+  # Generator of mca records (see getMCA) for asm code in source.
+  # Source is a path or an iterable of lines, lines are normalized
+  # and tokenized one by one. Yields None if the code cannot be converted.
+  # If symbols is a dictionary, it is filled with label -> address.
+  tokens = reorganizeTokens(getTokens(normalizeLines(readSource(source))))
+  result = processTokens(tokens)
+  if result is None:
+    yield None
+    return
+  memory, labels = result
+  if symbols is not None:
+    symbols.update(labels)
+  yield from getMCA(memory)
+
+
+def asm2mca(source, symbols=None):
+  # Convert asm code into a list of mca records (see getMCA).
+  # Source is a path or an iterable of lines.
+  # Returns None if the code cannot be converted.
+  # If symbols is a dictionary, it is filled with label -> address.
+  output = []
+  for record in generateMCA(source, symbols):
+    if record is None:
+      return None
+    output.append(record)
+
+  return output
 
 
 def printWelcomeMsg():
@@ -521,4 +528,7 @@ asm2mca.py program.asm | tail -n +15
       
 if __name__ == '__main__':
   printWelcomeMsg()
-  asm2mca(sys.argv[1])
+  for record in generateMCA(sys.argv[1]):
+    if record is None:
+      sys.exit(1)
+    print(formatMCA(record))
@@ -0,0 +1,118 @@
+from types import MappingProxyType
+
+# Instruction set of VSC shared by asm2mca, mca2mc and vsc.
+#
+# condition describes the operand:
+# aa, aaa, aaaa, aaaaa - an address, unsigned integer with given number of digits,
+# ss, sssss            - value, signed integer, the first digit codes the sign,
+# None                 - no operand.
+# Instruction with 5 digit opcode and an operand is two bytes long,
+# the operand is located in the next byte.
+#
+# All tables are created once, when the module is imported,
+# and must not be modified.
+
+instructions = tuple(MappingProxyType(i) for i in [
+  {"mnemonic": "HLT",  "addressing": "noOperand", "opcode": "00000", "condition": None},
+  {"mnemonic": "CPA",  "addressing": "direct",    "opcode": "1",     "condition": "aaaa"},
+  {"mnemonic": "CPA",  "addressing": "immediate", "opcode": "921",   "condition": "ss"},
+  {"mnemonic": "CPA",  "addressing": "immediate", "opcode": "93100", "condition": "sssss"},
+  {"mnemonic": "CPA",  "addressing": "indirect",  "opcode": "941",   "condition": "aa"},
+  {"mnemonic": "CPA",  "addressing": "indirect",  "opcode": "95100", "condition": "aaaaa"},
+  {"mnemonic": "STO",  "addressing": "direct",    "opcode": "2",     "condition": "aaaa"},
+  {"mnemonic": "STO",  "addressing": "indirect",  "opcode": "942",   "condition": "aa"},
+  {"mnemonic": "STO",  "addressing": "indirect",  "opcode": "95200", "condition": "aaaaa"},
+  {"mnemonic": "ADD",  "addressing": "direct",    "opcode": "3",     "condition": "aaaa"},
+  {"mnemonic": "ADD",  "addressing": "immediate", "opcode": "923",   "condition": "ss"},
+  {"mnemonic": "ADD",  "addressing": "immediate", "opcode": "93300", "condition": "sssss"},
+  {"mnemonic": "ADD",  "addressing": "indirect",  "opcode": "943",   "condition": "aa"},
+  {"mnemonic": "ADD",  "addressing": "indirect",  "opcode": "95300", "condition": "aaaaa"},
+  {"mnemonic": "SUB",  "addressing": "direct",     "opcode": "4",     "condition": "aaaa"},
+  {"mnemonic": "SUB",  "addressing": "immediate",  "opcode": "924",   "condition": "ss"},
+  {"mnemonic": "SUB",  "addressing": "immediate",  "opcode": "93400", "condition": "sssss"},
+  {"mnemonic": "SUB",  "addressing": "indirect",   "opcode": "944",   "condition": "aa"},
+  {"mnemonic": "SUB",  "addressing": "indirect",   "opcode": "95400", "condition": "aaaaa"},
+  {"mnemonic": "MUL",  "addressing": "direct",     "opcode": "5",     "condition": "aaaa"},
+  {"mnemonic": "MUL",  "addressing": "immediate",  "opcode": "925",   "condition": "ss"},
+  {"mnemonic": "MUL",  "addressing": "immediate",  "opcode": "93500", "condition": "sssss"},
+  {"mnemonic": "MUL",  "addressing": "indirect",   "opcode": "945",   "condition": "aa"},
+  {"mnemonic": "MUL",  "addressing": "indirect",   "opcode": "95500", "condition": "aaaaa"},
+  {"mnemonic": "BRA",  "addressing": "immediate",  "opcode": "6",     "condition": "aaaa"},
+  {"mnemonic": "BRN",  "addressing": "immediate",  "opcode": "7",     "condition": "aaaa"},
+  {"mnemonic": "BRNF", "addressing": "immediate",  "opcode": "907",   "condition": "aa"},
+  {"mnemonic": "BRZ",  "addressing": "immediate",  "opcode": "8",     "condition": "aaaa"},
+  {"mnemonic": "BRZF", "addressing": "immediate",  "opcode": "908",   "condition": "aa"},
+  {"mnemonic": "INC",  "addressing": "direct",     "opcode": "01",    "condition": "aaa"},
+  {"mnemonic": "DEC",  "addressing": "direct",     "opcode": "02",    "condition": "aaa"},
+  {"mnemonic": "PUSH", "addressing": "noOperand",  "opcode": "03000", "condition": None},
+  {"mnemonic": "PUSH", "addressing": "direct",     "opcode": "91030", "condition": "aaaaa"},
+  {"mnemonic": "PUSH", "addressing": "immediate",  "opcode": "93030", "condition": "sssss"},
+  {"mnemonic": "PUSH", "addressing": "indirect",   "opcode": "95030", "condition": "aaaaa"},
+  {"mnemonic": "POP",  "addressing": "noOperand",  "opcode": "04000", "condition": None},
+  {"mnemonic": "POP",  "addressing": "direct",     "opcode": "91040", "condition": "aaaaa"},
+  {"mnemonic": "POP",  "addressing": "indirect",   "opcode": "95040", "condition": "aaaaa"}
+])
+
+branchMnemonics = frozenset({"BRA", "BRN", "BRNF", "BRZ", "BRZF"})
+branchOpcodes = frozenset(i["opcode"] for i in instructions if i["mnemonic"] in branchMnemonics)
+
+# mnemonic -> tuple of all forms of instruction
+instructionsByMnemonic = {}
+# (mnemonic, addressing) -> tuple of forms, one byte form first
+instructionsByForm = {}
+# opcode -> instruction; no opcode is a prefix of another one
+instructionsByOpcode = {}
+
+for i in instructions:
+  instructionsByMnemonic[i["mnemonic"]] = instructionsByMnemonic.get(i["mnemonic"], ()) + (i,)
+  key = (i["mnemonic"], i["addressing"])
+  instructionsByForm[key] = instructionsByForm.get(key, ()) + (i,)
+  instructionsByOpcode[i["opcode"]] = i
+
+instructionsByMnemonic = MappingProxyType(instructionsByMnemonic)
+instructionsByForm = MappingProxyType(instructionsByForm)
+instructionsByOpcode = MappingProxyType(instructionsByOpcode)
+
+
+def getInstructions():
+  return instructions
+
+
+def findOpcode(code, opcodes=instructionsByOpcode):
+  # Find opcode of 5 digit machine code, for example "945" for "94512".
+  # Opcodes have 5, 3, 2 or 1 digits and no opcode is a prefix of another.
+  # Opcodes are keys of instructionsByOpcode or of another dictionary,
+  # for example VSC.instructionForms. Returns None if code is not an instruction.
+  for n in (5, 3, 2, 1):
+    if code[0:n] in opcodes:
+      return code[0:n]
+  return None
+
+
+def checkIfFit(operand, condition):
+  o = int(operand)
+  # Integer without a sign
+  if condition in {"aa", "aaa", "aaaa", "aaaaa"}:
+    if o < 0:
+      return None
+    d = len(condition)
+    s = f"{o:0{d}d}"
+    if len(s)>d:
+      return None
+    return s
+  # Integer with a sign, also given as a word in sign-magnitude form
+  # (10005 is -5), the way asm2mca writes numbers
+  elif condition in {"ss", "sssss"}:
+    if 10000 <= o < 20000:
+      o = -(o % 10000)
+    d = len(condition)-1
+    s = f"{abs(o):0{d}d}"
+    if len(s)>d:
+      return None
+    if o>=0:
+      s = "0" + s
+    else:
+      s = "1" + s
+    return s
+  else:
+    return None
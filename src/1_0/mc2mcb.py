@@ -0,0 +1,182 @@
+import mmap
+import struct
+import sys
+from array import array
+
+# mcb - (Machine Code Binary) - mc packed into runs of memory words
+#
+# All numbers are little endian.
+# header: magic "VSCB", version (uint16), 0 (uint16),
+#         number of runs (uint32), number of symbols (uint32)
+# run:    address (uint16), number of words (uint16), words (int32 each)
+# symbol: address (uint16), length of name (uint16), name (utf8)
+#
+# Words are stored the same way as VSC keeps them in memory, as integers
+# of 5 digit words in sign-magnitude form, for example 10005 is -5.
+# Header, run headers and words take multiples of 4 bytes, so every run
+# of words is aligned and can be used directly from a memory mapped file.
+magic = b"VSCB"
+version = 1
+headerFormat = struct.Struct("<4sHHII")
+runFormat = struct.Struct("<HH")
+symbolFormat = struct.Struct("<HH")
+maxWord = 99999
+
+
+def getRuns(records):
+  # Group mc records {"address", "value", ...} into runs of consecutive
+  # addresses: list of (address, array of words). Returns None if a record
+  # is not correct.
+  memory = {}
+  for r in records:
+    address = r["address"]
+    value = r["value"]
+    if not (address.isdigit() and value.isdigit()) or int(value) > maxWord:
+      print(f"Incorrect address ({address}) or value ({value})")
+      return None
+    memory[int(address)] = int(value)
+
+  runs = []
+  for address in sorted(memory):
+    if runs and runs[-1][0] + len(runs[-1][1]) == address and len(runs[-1][1]) < 0xFFFF:
+      runs[-1][1].append(memory[address])
+    else:
+      runs.append((address, array('i', [memory[address]])))
+  return runs
+
+
+def packMCB(records, symbols=None):
+  # Pack mc records and symbols {label: address} into bytes of mcb format.
+  # Returns None if records cannot be packed.
+  runs = getRuns(records)
+  if runs is None:
+    return None
+  symbols = symbols or {}
+
+  parts = [headerFormat.pack(magic, version, 0, len(runs), len(symbols))]
+  for address, words in runs:
+    if sys.byteorder != "little":
+      words = array('i', words)
+      words.byteswap()
+    parts.append(runFormat.pack(address, len(words)))
+    parts.append(words.tobytes())
+  for label, address in symbols.items():
+    name = label.encode("utf8")
+    parts.append(symbolFormat.pack(int(address), len(name)))
+    parts.append(name)
+  return b"".join(parts)
+
+
+def writeMCB(path, records, symbols=None):
+  data = packMCB(records, symbols)
+  if data is None:
+    return False
+  with open(path, "wb") as fileDst:
+    fileDst.write(data)
+  return True
+
+
+def readMCB(buffer):
+  # Read mcb from bytes, mmap or any other buffer.
+  # Returns {"runs": [(address, memoryview of int32 words)], "symbols": {label: address}}
+  # or None if buffer is not correct mcb. Runs are views of buffer, nothing is copied,
+  # so they must be released before the buffer is closed.
+  view = memoryview(buffer)
+  if len(view) < headerFormat.size:
+    print("File is too short to be mcb")
+    return None
+  tag, ver, _, runCount, symbolCount = headerFormat.unpack_from(view)
+  if tag != magic or ver != version:
+    print("File is not mcb or its version is not supported")
+    return None
+
+  runs = []
+  offset = headerFormat.size
+  for i in range(runCount):
+    if offset + runFormat.size > len(view):
+      print("Run header outside of file")
+      return None
+    address, count = runFormat.unpack_from(view, offset)
+    offset += runFormat.size
+    end = offset + 4*count
+    if end > len(view):
+      print(f"Words of run at address {address:04d} outside of file")
+      return None
+    words = view[offset:end].cast('i')
+    if sys.byteorder != "little":
+      words = array('i', words)
+      words.byteswap()
+      words = memoryview(words)
+    runs.append((address, words))
+    offset = end
+
+  symbols = {}
+  for i in range(symbolCount):
+    if offset + symbolFormat.size > len(view):
+      print("Symbol outside of file")
+      return None
+    address, length = symbolFormat.unpack_from(view, offset)
+    offset += symbolFormat.size
+    symbols[bytes(view[offset:offset+length]).decode("utf8")] = f"{address:04d}"
+    offset += length
+
+  return {"runs": runs, "symbols": symbols}
+
+
+def openMCB(path):
+  # Memory map mcb file. Returns (mmap, result of readMCB);
+  # mmap is None if file is empty or doesn't exist.
+  try:
+    with open(path, "rb") as fileSrc:
+      mapped = mmap.mmap(fileSrc.fileno(), 0, access=mmap.ACCESS_READ)
+  except (OSError, ValueError):
+    print(f"Cannot load {path} file")
+    return (None, None)
+  return (mapped, readMCB(mapped))
+
+
+def parseMC(lines):
+  # Convert lines of mc code into mc records {"address", "value", "comment"}.
+  records = []
+  for l in lines:
+    ln = l.split(";")
+    comment = ln[1].strip() if len(ln) > 1 else ""
+    ln = ln[0].split()
+    if len(ln) == 2:
+      records.append({"address": ln[0], "value": ln[1], "comment": comment})
+    elif len(ln):
+      print("Incorrect syntax in line:")
+      print(l.strip())
+  return records
+
+
+def printWelcomeMsg():
+  text = \
+'''
+Welcome to mc to mcb converter
+Version 1.0
+
+Please note conversion pattern:
+# asm -> mca -> mc -> mcb
+# mc - (Machine Code) - pure machine code
+# mcb - (Machine Code Binary) - machine code packed into runs of words,
+#       loaded by vsc.py without parsing text
+
+Usage: py mc2mcb.py program.mc [program.mcb]
+'''
+
+  print(text)
+
+
+if __name__ == '__main__':
+  if len(sys.argv) not in {2, 3}:
+    printWelcomeMsg()
+    sys.exit(1)
+
+  pathSrc = sys.argv[1]
+  pathDst = sys.argv[2] if len(sys.argv) == 3 else pathSrc.removesuffix(".mc") + ".mcb"
+  with open(pathSrc, encoding="utf8") as fileSrc:
+    records = parseMC(fileSrc)
+  if not writeMCB(pathDst, records):
+    sys.exit(1)
+  print(f"{pathDst}: {len(records)} words")
@@ -0,0 +1,41 @@
+import contextlib
+import io
+import unittest
+
+from asm2mc import assemble
+
+
+def assembleQuietly(text, previous=None):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return assemble(text, previous)
+
+
+class IncrementalAssemblyTest(unittest.TestCase):
+    # assemble(text, previous) must give the same result as assemble(text)
+
+    def assertSameAsFull(self, oldText, newText):
+        incremental = assembleQuietly(newText, assembleQuietly(oldText))
+        full = assembleQuietly(newText)
+        for key in ("mca", "mc", "symbols"):
+            self.assertEqual(incremental[key], full[key])
+        return full
+
+    def test_removed_last_definition_of_duplicated_label(self):
+        # C1 is defined twice, the last definition wins. When it is removed,
+        # C1 moves to the earlier definition, right after CPA [C1], and the
+        # operand of CPA fits in one byte.
+        oldText = ".code 95\nA: CPA [C1]\nC1: HLT\nINC 1\n.code 200\nC1: HLT\n"
+        newText = ".code 95\nA: CPA [C1]\nC1: HLT\nINC 1\n.code 200\nHLT\n"
+        full = self.assertSameAsFull(oldText, newText)
+        self.assertEqual(full["mca"][0]["address"], "0095")
+        self.assertEqual(full["mca"][0]["operand"], "0096")
+        self.assertEqual(full["mca"][1]["address"], "0096")
+
+    def test_renamed_last_definition_of_duplicated_label(self):
+        oldText = ".code 95\nA: CPA [C1]\nC1: HLT\nINC 1\n.code 200\nC1: HLT\n"
+        newText = ".code 95\nA: CPA [C1]\nC1: HLT\nINC 1\n.code 200\nC2: HLT\n"
+        self.assertSameAsFull(oldText, newText)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,15 @@
+import json
 import os
 import random
 import re
+import struct
+import sys
+import time
+from array import array
+
+from instructions import branchMnemonics, branchOpcodes, findOpcode, getInstructions, instructionsByOpcode
+from mc2mcb import openMCB
+from vscjit import compileBlock
 
 # asm -> mca -> mc
 # asm - assembler with mnemonic, labels etc.
@@ -8,6 +17,7 @@ import re
 # mc - (Machine Code) - pure machine code
 class VSC:
   memorySize = 10000 # Addresses from 0000 to 9999
+  pageSize = 100 # memory cells per page of a snapshot
 
   acc = None
   bp = 9999
@@ -17,73 +27,264 @@ class VSC:
   #mbr = None # memory buffer register
   #ir = None # instruction register
   flags = {"zero": False, "negative": False}
-  memory = None
+  # memory - memory cells as integers, 5 digit words in sign-magnitude form,
+  # it is not a class attribute, so lazy memory policy can create it on first use
+  memoryPolicy = "random" # initial content of memory: zero, random or lazy
+  seed = None # seed of random memory, None to use the random module
+  decoded = None # decoded instructions cache, one entry per memory cell
+  pages = None # content of every page (bytes) when the last snapshot was taken or restored
+  dirtyPages = None # pages written since then
   halted = None
+  fault = None # reason of the last general protection fault, if any
   programInMemory = None
+  symbols = {} # label -> address, loaded from mcb
+  steps = 0 # number of executed instructions
+  cycles = 0 # cost of executed instructions, see setCostModel
+  profile = None # execution counts collected by run, see startProfile
+  breakpoints = None # run stops before executing instruction at these addresses
+  watchpoints = None # run stops after a write to these addresses
+  watchHit = None # the last write to a watched address: {address, old, new, ip}
+  trace = None # trace being recorded, see startTrace
+  history = None # executed instructions which can be undone, see startHistory
+  jit = False # run executes compiled basic blocks when nothing observes single steps
+  blocks = None # compiled basic blocks: address -> (function, instructions, cells) or False
+  blockCells = None # memory cell -> addresses of compiled blocks which contain it
+  blocksChanged = False # set when a write invalidates a compiled block
+
+  # Both tables are keyed by opcode and filled with registerInstruction.
+  instructionForms = {} # opcode -> operand condition (aa, aaaa, ss, ... or None)
+  dispatchTable = {} # opcode -> handler
+  cycleCosts = {} # opcode -> cycles, see getCycleCosts
+  registeredCycles = {} # opcode -> cycles of opcodes unknown to the cost model
+  branchTakenCycles = 0 # additional cycles of a taken branch
+
+
+  def __init__(self, memoryPolicy="random", seed=None):
+    # memoryPolicy:
+    # zero   - all cells are 0,
+    # random - random values, like in a real machine after power on,
+    # lazy   - random values, created when memory is used for the first time;
+    #          nothing is created if reset is called first.
+    # Random values come from random.Random(seed) if seed is given,
+    # otherwise from the random module.
+    if memoryPolicy not in {"zero", "random", "lazy"}:
+      raise ValueError(f"Unknown memory policy: {memoryPolicy}")
+    self.memoryPolicy = memoryPolicy
+    self.seed = seed
+    if memoryPolicy != "lazy":
+      self.memory = self.createMemory()
+    self.decoded = [None] * self.memorySize
+    self.pages = [None] * (self.memorySize // self.pageSize)
+    self.dirtyPages = set()
+    self.clearBlocks()
+    self.flags = {"zero": False, "negative": False}
+    self.breakpoints = set()
+    self.watchpoints = set()
+
+  def __getattr__(self, name):
+    # Called only for attributes which are not found, memory is missing
+    # only if it was not used yet by a machine with lazy memory policy.
+    if name == "memory" and self.memoryPolicy == "lazy":
+      self.memory = self.createMemory()
+      return self.memory
+    raise AttributeError(name)
+
+
+  def createMemory(self):
+    if self.memoryPolicy == "zero":
+      return array('i', [0]) * self.memorySize
+    # Fill memory with some random values
+    generator = random if self.seed is None else random.Random(self.seed)
+    return array('i', generator.choices(range(100000), k=self.memorySize))
 
 
-  def __init__(self):
-    self.memory = [f"{random.randint(0, 99999):05d}" for i in range(self.memorySize)] # Fill memory with some random values
-    # memory = random.sample(range(0, 99999+1), self.memorySize)
-
   def printAddressFromRanges(self, ranges, reverse = False):
     for r in ranges:
       if r["type"] == "number":
         i = r["position"]
-        print(f"M[{i:04d}] = {self.memory[i]}")
+        print(f"M[{i:04d}] = {self.memory[i]:05d}")
       elif r["type"] == "range":
         if reverse:
           for i in range(r["end"], r["begin"]-1, -1):
-            print(f"M[{i:04d}] = {self.memory[i]}")
+            print(f"M[{i:04d}] = {self.memory[i]:05d}")
         else:
           for i in range(r["begin"], r["end"]+1):
-            print(f"M[{i:04d}] = {self.memory[i]}")
+            print(f"M[{i:04d}] = {self.memory[i]:05d}")
 
   def reset(self):
-    self.memory = ["00000" for i in range(self.memorySize)]
+    self.memory = array('i', [0]) * self.memorySize
+    self.decoded = [None] * self.memorySize
+    self.pages = [None] * (self.memorySize // self.pageSize)
+    self.dirtyPages = set()
+    self.clearBlocks()
     self.halted = False
+    self.fault = None
+    self.steps = 0
+    self.cycles = 0
+
+
+  def writeMemory(self, address, valueBits):
+    if address in self.watchpoints:
+      self.watchHit = {"address": address, "old": self.memory[address],
+                       "new": valueBits, "ip": self.ip}
+    if self.history is not None:
+      self.history["writes"].append((address, self.memory[address]))
+    self.memory[address] = valueBits
+    # Cell at address may be an instruction or the second byte
+    # of the instruction located one cell before.
+    self.decoded[address] = None
+    if address > 0:
+      self.decoded[address-1] = None
+    self.dirtyPages.add(address // self.pageSize)
+    if address in self.blockCells:
+      self.invalidateBlocks(address)
+
+
+  def clearBlocks(self):
+    # Forget all compiled blocks, for example when memory is replaced
+    # without writeMemory or cycle costs are changed.
+    self.blocks = {}
+    self.blockCells = {}
+    self.blocksChanged = True
+
+
+  def invalidateBlocks(self, address):
+    # Remove compiled blocks which contain the cell at address
+    for start in self.blockCells.pop(address):
+      block = self.blocks.pop(start, None)
+      cells = block[2] if block else (start,)
+      for cell in cells:
+        starts = self.blockCells.get(cell)
+        if starts is not None:
+          starts.discard(start)
+          if not starts:
+            del self.blockCells[cell]
+    self.blocksChanged = True
+
+
+  def getBlock(self, address):
+    # Compiled block starting at address, False if the instruction
+    # at address cannot be compiled (see vscjit).
+    block = self.blocks.get(address)
+    if block is None:
+      block = compileBlock(self, address) or False
+      self.blocks[address] = block
+      for cell in block[2] if block else (address,):
+        self.blockCells.setdefault(cell, set()).add(address)
+    return block
+
+
+  def snapshot(self):
+    # Snapshot of the whole state of the machine. Memory is kept as a tuple
+    # of immutable pages. Pages which were not written since the previous
+    # snapshot or restore are shared with it, not copied.
+    memoryView = memoryview(self.memory)
+    for p in range(len(self.pages)):
+      if self.pages[p] is None or p in self.dirtyPages:
+        self.pages[p] = memoryView[p*self.pageSize:(p+1)*self.pageSize].tobytes()
+    memoryView.release()
+    self.dirtyPages = set()
+
+    return {"pages": tuple(self.pages), "acc": self.acc, "ip": self.ip,
+            "sp": self.sp, "bp": self.bp, "flags": dict(self.flags),
+            "halted": self.halted, "fault": self.fault, "steps": self.steps,
+            "cycles": self.cycles, "programInMemory": self.programInMemory}
+
+
+  def restore(self, snapshot):
+    # Only pages which differ from the snapshot are copied into memory,
+    # decoded instructions of other pages stay valid.
+    memoryView = memoryview(self.memory)
+    for p, page in enumerate(snapshot["pages"]):
+      if page is not self.pages[p] or p in self.dirtyPages:
+        begin = p*self.pageSize
+        end = begin + self.pageSize
+        memoryView[begin:end] = memoryview(page).cast('i')
+        self.decoded[max(begin-1, 0):end] = [None] * (end - max(begin-1, 0))
+        self.pages[p] = page
+    memoryView.release()
+    self.dirtyPages = set()
+    self.clearBlocks()
+
+    self.acc = snapshot["acc"]
+    self.ip = snapshot["ip"]
+    self.sp = snapshot["sp"]
+    self.bp = snapshot["bp"]
+    self.flags = dict(snapshot["flags"])
+    self.halted = snapshot["halted"]
+    self.fault = snapshot["fault"]
+    self.steps = snapshot["steps"]
+    self.cycles = snapshot["cycles"]
+    self.programInMemory = snapshot["programInMemory"]
+
+
+  def getCycles(self, opcode):
+    # Cycles of the opcode in the cost model or given to registerInstruction
+    cycles = self.cycleCosts.get(opcode)
+    if cycles is None:
+      cycles = self.registeredCycles.get(opcode, self.cycleCosts["unknown"])
+    return cycles
+
+
+  def decodeInstruction(self, address):
+    # Decoded instruction is a tuple (opcode, operand, length, cycles).
+    # Opcode is the constant part of the machine code, for example 1 for 1aaaa
+    # or 95100 for 95100 aaaaa. Length is the number of memory cells
+    # occupied by the instruction, cycles its cost (see getCycleCosts).
+    # Operand of two byte instruction and short value ss are decoded
+    # to memory words, short addresses aa, aaa and aaaa to integers.
+    word = self.memory[address]
+    instruction = f"{word:05d}"
+    decoded = ("unknown", None, 1, self.cycleCosts["unknown"])
+
+    opcode = findOpcode(instruction, self.instructionForms) if word >= 0 else None
+    if opcode is not None and len(instruction) == 5:
+      n = len(opcode)
+      condition = self.instructionForms[opcode]
+      if condition is None:
+        decoded = (opcode, None, 1, self.getCycles(opcode))
+      elif n == 5: # Operand is located in the next byte
+        if address+1 < self.memorySize:
+          decoded = (opcode, self.memory[address+1], 2, self.getCycles(opcode))
+      elif condition[0] == "s":
+        valueWord = int(instruction[n+1:])
+        if instruction[n] != "0":
+          valueWord += 10000
+        decoded = (opcode, valueWord, 1, self.getCycles(opcode))
+      else:
+        decoded = (opcode, int(instruction[n:]), 1, self.getCycles(opcode))
+
+    self.decoded[address] = decoded
+    return decoded
 
 
   def setStartAddr(self, startAddr):
     self.ip = startAddr
 
 
-  def bitsToInt(self, bits):
-    sign = bits[0]
-    v = None
-
-    if sign == "0":
-      v = int(bits[1:])
-    else:
-      v = (-1) * int(bits[1:])
-
-    return v
-
-  def intToBits(self, integer):
-    bits = f"{integer:05d}"
-
-    if integer<0:
-      bits = '1' + bits[1:]
-
-    return bits
-
-  def getValueAtAddressAsBits(self, address):
-    valueS = self.memory[address]
-    return self.fillBitsToLength(valueS)
+  # Every memory cell and the accumulator keep a 5 digit word as an integer,
+  # for example 10008 for -8. The most significant digit codes the sign
+  # (0 - positive value) and the remaining 4 digits code the absolute value.
+  def wordToInt(self, word):
+    if word < 10000:
+      return word
+    return -(word % 10000)
 
+  def intToWord(self, integer):
+    # Absolute values larger than 9999 do not fit and are cut to 4 digits.
+    if integer < 0:
+      return 10000 + (-integer) % 10000
+    return integer % 10000
 
-  def fillBitsToLength(self, bits):
-    bitsN = bits
-    l = len(bitsN)
-    if l<5:
-      bitsN = "0" * (5-l) + bitsN
-
-    return bitsN
+  def wordToBits(self, word):
+    if word is None:
+      return "None"
+    return f"{word:05d}"
 
 
   def printAccumulatorInfo(self):
-    print(f"Value in accumulator as bits: {self.acc}")
-    v = self.printIntWithSign(self.bitsToInt(self.acc))
+    print(f"Value in accumulator as bits: {self.wordToBits(self.acc)}")
+    v = self.printIntWithSign(self.wordToInt(self.acc))
     print(f"Value in accumulator as int: {v}")
 
 
@@ -94,7 +295,7 @@ class VSC:
 
 
   def updateFlags(self, valueBits):
-    accV = self.bitsToInt(valueBits)
+    accV = self.wordToInt(valueBits)
     self.flags["zero"] = False
     self.flags["negative"] = False
 
@@ -104,663 +305,1226 @@ class VSC:
       self.flags["negative"] = True
 
 
-  def checkIfStackPointersCorrect(self, operationType):
-    if 'push':
+  def checkIfStackPointersCorrect(self, operationType, verbose=True):
+    if operationType == 'push':
       if self.sp-1 < 0:
-        print("!!! General protection fault !!!")
-        print("No free space on stack")
-        print("Machine halted")
+        if verbose:
+          print("!!! General protection fault !!!")
+          print("No free space on stack")
+          print("Machine halted")
+        self.fault = "No free space on stack"
         self.halted = True
         return False
-    elif 'pop':
-      if self.sp+1 > self.bp:
-        print("!!! General protection fault !!!")
-        print("Access violation, try to reach beyond the stack base")
-        print("Machine halted")
+    elif operationType == 'pop':
+      if self.sp == self.bp:
+        if verbose:
+          print("!!! General protection fault !!!")
+          print("Access violation, stack is empty")
+          print("Try to reach beyond the stack base")
+          print("Machine halted")
+        self.fault = "Access violation, stack is empty"
         self.halted = True
         return False
-      elif self.sp == self.bp:
-        print("!!! General protection fault !!!")
-        print("Access violation, stack is empty")
-        print("Try to reach beyond the stack base")
-        print("Machine halted")
+      elif self.sp+1 > self.bp:
+        if verbose:
+          print("!!! General protection fault !!!")
+          print("Access violation, try to reach beyond the stack base")
+          print("Machine halted")
+        self.fault = "Access violation, try to reach beyond the stack base"
         self.halted = True
         return False
 
     return True
 
-  def executeInstruction(self):
-    if not self.programInMemory:
-      print("There is no program in memory")
-      return
+  def getInstructionRegister(self):
+    # Word at ip, None if ip is not set or is outside memory
+    if self.ip is None or not 0 <= self.ip < self.memorySize:
+      return None
+    return self.memory[self.ip]
 
-    if self.halted:
-      print("Program execution halted. Please do reset")
-      return
-    elif self.halted is None:
-      self.halted = False
-
-    instruction = self.memory[self.ip]
 
+  def printRegisters(self, instruction):
     print("Registers:")
-    print(f"IR = {instruction}")
+    print(f"IR = {'unknown' if instruction is None else self.wordToBits(instruction)}")
     print(f"BP = {self.bp:04d}")
     print(f"SP = {self.sp:04d}")
-    print(f" A = {self.acc}")
+    print(f" A = {self.wordToBits(self.acc)}")
     print(f"IP = {self.ip}")
     print("Flags:")
     for f in self.flags:
       print(f"{f:<8} = {self.flags[f]}")
     print("")
 
-    if len(instruction) != 5:
-      instruction = None
 
-    if instruction[0] == "0":
-      if instruction == "00000":
-        print("Description: Stop the cpu.")
-        print("Mnemonic: HLT")
-        print("Machine code: 00000")
-        self.halted = True
-      elif instruction[0:2] == "01":
-        address = int(instruction[2:5])
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        valueIntNew = valueInt + 1
-        valueBitsNew = self.intToBits(valueIntNew)
-        print("Description: Increase value at address aaa by 1, M[aaa] := M[aaa] + 1.")
-        print("Mnemonic: INC aaa")
-        print("Machine code: 01aaa")
-        print("Addressing: direct")
-        print(f"Old value at address {address:04d} as bits: {valueBits}")
-        print(f"Old value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
-        print(f"New value at address {address:04d} as bits: {valueBitsNew}")
-        print(f"New value at address {address:04d} as int: {self.printIntWithSign(valueIntNew)}")
-        self.memory[address] = valueBitsNew
-        self.updateFlags(valueBitsNew)
-        self.ip += 1
-      elif instruction[0:2] == "02":
-        address = int(instruction[2:5])
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        valueIntNew = valueInt - 1
-        valueBitsNew = self.intToBits(valueIntNew)
-        print("Description: Decrease value at address aaa by 1, M[aaa] := M[aaa] - 1.")
-        print("Mnemonic: DEC aaa")
-        print("Machine code: 02aaa")
-        print("Addressing: direct")
-        print(f"Old value at address {address:04d} as bits: {valueBits}")
-        print(f"Old value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
-        print(f"New value at address {address:04d} as bits: {valueBitsNew}")
-        print(f"New value at address {address:04d} as int: {self.printIntWithSign(valueIntNew)}")
-        self.memory[address] = valueBitsNew
-        self.updateFlags(valueBitsNew)
-        self.ip += 1
-      elif instruction == "03000":
-        # When you put something onto the stack (PUSH onto the stack),
-        # the SP is decremented before the item is placed on the stack.
-        print("Description: Push value from accumulator onto the stack, A -> STACK.")
-        print("Mnemonic: PUSH")
-        print("Machine code: 03000")
-        print("Addressing: immediate")
-        if self.checkIfStackPointersCorrect('push'):
-          self.sp -= 1
-          self.memory[self.sp] = self.acc
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          print(f"M[SP] as bits: {valueBits}")
-          self.ip += 1
-      elif instruction == "04000":
-        # When you take something off of the stack (PULL from the stack),
-        # the SP is incremented after the item is pulled from the stack
-        print("Description: Pop value from the stack to accumulator, STACK -> A.")
-        print("Mnemonic: POP")
-        print("Machine code: 04000")
-        print("Addressing: immediate")
-        if self.checkIfStackPointersCorrect('pop'):
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          self.acc = valueBits
-          self.sp += 1
-          print(f"Value popped from the stack as bits: {valueBits}")
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          self.printAccumulatorInfo()
-          self.ip += 1
-    elif instruction[0] == "1":
-      address = int(instruction[1:5])
-      valueBits = self.getValueAtAddressAsBits(address)
+  def executeInstruction(self, verbose=True):
+    if not self.programInMemory:
+      if verbose:
+        print("There is no program in memory")
+      return
+
+    if self.halted:
+      if verbose:
+        print("Program execution halted. Please do reset")
+      return
+    elif self.halted is None:
+      self.halted = False
+
+    if self.history is not None:
+      self.recordHistory()
+    instruction = self.memory[self.ip]
+    decoded = self.decoded[self.ip]
+    if decoded is None:
+      decoded = self.decodeInstruction(self.ip)
+    opcode, operand, length, cycles = decoded
+    self.steps += 1
+    self.cycles += cycles
+
+    if verbose:
+      self.printRegisters(instruction)
+
+    if self.profile is None and self.trace is None:
+      self.dispatchTable[opcode](self, operand, verbose)
+      return
+
+    address = self.ip
+    if self.trace is not None:
+      accBefore = self.acc
+      effectiveAddress = self.getEffectiveAddress(opcode, operand)
+    if self.profile is not None:
+      self.profile["addresses"][address] += 1
+      self.profile["opcodes"][opcode] = self.profile["opcodes"].get(opcode, 0) + 1
+    self.dispatchTable[opcode](self, operand, verbose)
+    if self.profile is not None and opcode in branchOpcodes:
+      if self.ip != address + length:
+        self.profile["taken"][address] += 1
+      else:
+        self.profile["notTaken"][address] += 1
+    if self.trace is not None:
+      self.recordStep(address, opcode, effectiveAddress, accBefore)
+
+
+  # Handlers, one for every form of instruction from getInstructions().
+  # Handler name is built by getHandlerName.
+  def executeHLTNoOperand(self, operand, verbose=True):
+    if verbose:
+      print("Description: Stop the cpu.")
+      print("Mnemonic: HLT")
+      print("Machine code: 00000")
+    self.halted = True
+
+
+  def executeCPADirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    if verbose:
       print("Description: Copy value from memory at address aaaa to accumulator, A := M[aaaa].")
       print("Mnemonic: CPA aaaa")
       print("Machine code: 1aaaa")
       print("Addressing: direct")
-      print(f"Value at address {address:04d}: {valueBits}")
-      self.acc = valueBits
+      print(f"Value at address {address:04d}: {valueBits:05d}")
+    self.acc = valueBits
+    if verbose:
       self.printAccumulatorInfo()
-      self.ip += 1
-    elif instruction[0] == "2":
-      address = int(instruction[1:5])
-      valueBits = self.acc
+    self.ip += 1
+
+
+  def executeCPAImmediate(self, operand, verbose=True):
+    valueBits = operand
+    if verbose:
+      print("Description: Copy exact value ss to accumulator, A := ss.")
+      print("Mnemonic: CPA (ss)")
+      print("Machine code: 921ss")
+      print("Addressing: immediate, one byte length")
+      print(f"Value: {valueBits:05d}")
+    self.acc = valueBits
+    if verbose:
+      self.printAccumulatorInfo()
+    self.ip += 1
+
+
+  def executeCPAImmediateTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    valueBits = operand
+    if verbose:
+      print("Description: Copy exact value sssss (located in next byte) to accumulator, A := sssss.")
+      print("Mnemonic: CPA (sssss)")
+      print("Machine code: 93100 sssss")
+      print("Addressing: immediate, two byte length")
+      print(f"Value: {valueBits:05d}")
+    self.acc = valueBits
+    if verbose:
+      self.printAccumulatorInfo()
+    self.ip += 1
+
+
+  def executeCPAIndirect(self, operand, verbose=True):
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    if verbose:
+      print("Description: Copy value from memory at address given in memory at address aa to accumulator, A := M[M[aa]].")
+      print("Mnemonic: CPA [aa]")
+      print("Machine code: 941aa")
+      print("Addressing: indirect, one byte length")
+      print(f"Value: {valueBits:05d}")
+    self.acc = valueBits
+    if verbose:
+      self.printAccumulatorInfo()
+    self.ip += 1
+
+
+  def executeCPAIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    if verbose:
+      print("Description: Copy value from memory at address given in memory at address aaaaa to accumulator, A := M[M[aaaaa]].")
+      print("Mnemonic: CPA [aaaaa]")
+      print("Machine code: 95100 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Value: {valueBits:05d}")
+    self.acc = valueBits
+    if verbose:
+      self.printAccumulatorInfo()
+    self.ip += 1
+
+
+  def executeSTODirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.acc
+    if verbose:
       print("Description: Copy value from accumulator to memory at address aaaa, M[aaaa] := A.")
       print("Mnemonic: STO aaaa")
       print("Machine code: 2aaaa")
       print("Addressing: direct")
-      print(f"Store at address {address:04d} value: {valueBits}")
-      self.memory[address] = valueBits
-      self.ip += 1
-    elif instruction[0] == "3":
-      address = int(instruction[1:5])
-      valueBits = self.getValueAtAddressAsBits(address)
-      valueInt = self.bitsToInt(valueBits)
+      print(f"Store at address {address:04d} value: {valueBits:05d}")
+    self.writeMemory(address, valueBits)
+    self.ip += 1
+
+
+  def executeSTOIndirect(self, operand, verbose=True):
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.acc
+    if verbose:
+      print("Description: Copy value from accumulator to memory at address given in memory at address aa, M[M[aa]] := A.")
+      print("Mnemonic: STO [aa]")
+      print("Machine code: 942aa")
+      print("Addressing: indirect, one byte length")
+      print(f"Store at address {address:04d} value: {valueBits:05d}")
+    self.writeMemory(address, valueBits)
+    self.ip += 1
+
+
+  def executeSTOIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.acc
+    if verbose:
+      print("Description: Copy value from accumulator to memory at address given in memory at address aaaaa, M[M[aaaaa]] := A.")
+      print("Mnemonic: STO [aaaaa]")
+      print("Machine code: 95200 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Store at address {address:04d} value: {valueBits:05d}")
+    self.writeMemory(address, valueBits)
+    self.ip += 1
+
+
+  def executeADDDirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
       print("Description: Add value at specified address aaaa to accumulator. Result is stored in accumulator, A := A + M[aaaa].")
       print("Mnemonic: ADD aaaa")
       print("Machine code: 3aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      print(f"Value at address {address:04d} as bits: {valueBits}")
+      print(f"Value at address {address:04d} as bits: {valueBits:05d}")
       print(f"Value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
-      aInt = self.bitsToInt(self.acc)
-      rInt = aInt + valueInt
-      self.acc = self.intToBits(rInt)
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt + valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
       self.printAccumulatorInfo()
-      self.updateFlags(self.acc)
-      self.ip += 1
-    elif instruction[0] == "4":
-      address = int(instruction[1:5])
-      valueBits = self.getValueAtAddressAsBits(address)
-      valueInt = self.bitsToInt(valueBits)
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeADDImmediate(self, operand, verbose=True):
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Add exact value ss to accumulator. Result is stored in accumulator, A := A + ss.")
+      print("Mnemonic: ADD (ss)")
+      print("Machine code: 923ss")
+      print("Addressing: immediate, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt + valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeADDImmediateTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Add exact value sssss (located in next byte) to accumulator. Result is stored in accumulator, A := A + sssss.")
+      print("Mnemonic: ADD (sssss)")
+      print("Machine code: 93300 sssss")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt + valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeADDIndirect(self, operand, verbose=True):
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Add value from memory at address given in memory at address aa to accumulator, A := A + M[M[aa]].")
+      print("Mnemonic: ADD [aa]")
+      print("Machine code: 943aa")
+      print("Addressing: indirect, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt + valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeADDIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Add value from memory at address given in memory at address aaaaa to accumulator, A := A + M[M[aaaaa]].")
+      print("Mnemonic: ADD [aaaaa]")
+      print("Machine code: 95300 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt + valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeSUBDirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
       print("Description: Subtract value at specified address aaaa from accumulator. Result is stored in accumulator A := A - M[aaaa].")
       print("Mnemonic: SUB aaaa")
       print("Machine code: 4aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      print(f"Value at address {address:04d} as bits: {valueBits}")
+      print(f"Value at address {address:04d} as bits: {valueBits:05d}")
       print(f"Value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
-      aInt = self.bitsToInt(self.acc)
-      rInt = aInt - valueInt
-      self.acc = self.intToBits(rInt)
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt - valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
       self.printAccumulatorInfo()
-      self.updateFlags(self.acc)
-      self.ip += 1
-    elif instruction[0] == "5":
-      address = int(instruction[1:5])
-      valueBits = self.getValueAtAddressAsBits(address)
-      valueInt = self.bitsToInt(valueBits)
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeSUBImmediate(self, operand, verbose=True):
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Subtract exact value ss from accumulator. Result is stored in accumulator, A := A - ss.")
+      print("Mnemonic: SUB (ss)")
+      print("Machine code: 924ss")
+      print("Addressing: immediate, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt - valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeSUBImmediateTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Subtract exact value sssss (located in next byte) from accumulator. Result is stored in accumulator, A := A - sssss.")
+      print("Mnemonic: SUB (sssss)")
+      print("Machine code: 93400 sssss")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt - valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeSUBIndirect(self, operand, verbose=True):
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Subtract value from memory at address given in memory at address aa from accumulator, A := A + M[M[aa]].")
+      print("Mnemonic: SUB [aa]")
+      print("Machine code: 944aa")
+      print("Addressing: indirect, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt - valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeSUBIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Subtract value from memory at address given in memory at address aaaaa from accumulator, A := A - M[M[aaaaa]].")
+      print("Mnemonic: SUB [aaaaa]")
+      print("Machine code: 95400 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt - valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeMULDirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
       print("Description: Multiply value from accumulator by value at specified address aaaa. Result is stored in accumulator A := A * M[aaaa].")
       print("Mnemonic: MUL aaaa")
       print("Machine code: 5aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      print(f"Value at address {address:04d} as bits: {valueBits}")
+      print(f"Value at address {address:04d} as bits: {valueBits:05d}")
       print(f"Value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
-      aInt = self.bitsToInt(self.acc)
-      rInt = aInt * valueInt
-      self.acc = self.intToBits(rInt)
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt * valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
       self.printAccumulatorInfo()
-      self.updateFlags(self.acc)
-      self.ip += 1
-    elif instruction[0] == "6":
-      address = int(instruction[1:5])
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeMULImmediate(self, operand, verbose=True):
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Multiply value from accumulator by exact value ss. Result is stored in accumulator, A := A * ss.")
+      print("Mnemonic: MUL (ss)")
+      print("Machine code: 925ss")
+      print("Addressing: immediate, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt * valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeMULImmediateTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    valueBits = operand
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Multiply value from accumulator by exact value ss (located in next byte). Result is stored in accumulator, A := A * sssss.")
+      print("Mnemonic: MUL (sssss)")
+      print("Machine code: 93500 sssss")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt * valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeMULIndirect(self, operand, verbose=True):
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Multiply value from accumulator by value from memory at address given in memory at address aa, A := A * M[M[aa]].")
+      print("Mnemonic: MUL [aa]")
+      print("Machine code: 945aa")
+      print("Addressing: indirect, one byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt * valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeMULIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    if verbose:
+      print("Description: Multiply value from accumulator by value from memory at address given in memory at address aaaaa, A := A * M[M[aaaaa]].")
+      print("Mnemonic: MUL [aaaaa]")
+      print("Machine code: 95500 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Value as bits: {valueBits:05d}")
+      print(f"Value as int: {self.printIntWithSign(valueInt)}")
+    aInt = self.wordToInt(self.acc)
+    rInt = aInt * valueInt
+    self.acc = self.intToWord(rInt)
+    if verbose:
+      self.printAccumulatorInfo()
+    self.updateFlags(self.acc)
+    self.ip += 1
+
+
+  def executeBRAImmediate(self, operand, verbose=True):
+    address = operand
+    if verbose:
       print("Description: Unconditional branch to instruction located at address aaaa.")
       print("Mnemonic: BRA aaaa")
       print("Machine code: 6aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      self.ip = address
-    elif instruction[0] == "7":
-      address = int(instruction[1:5])
+    self.ip = address
+    self.cycles += self.branchTakenCycles
+
+
+  def executeBRNImmediate(self, operand, verbose=True):
+    address = operand
+    if verbose:
       print("Description: Conditional branch to instruction located at address aaaa if value stored in accumulator is negative.")
       print("Mnemonic: BRN aaaa")
       print("Machine code: 7aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      print(f"Value in accumulator: {self.acc}")
-      isNegative = True
+      print(f"Value in accumulator: {self.wordToBits(self.acc)}")
+    isNegative = True
 
-      if self.acc[0] == "0":
-        isNegative = False
+    if self.acc < 10000:
+      isNegative = False
 
-      if isNegative:
-        self.ip = address
+    if isNegative:
+      self.ip = address
+      self.cycles += self.branchTakenCycles
+      if verbose:
         print("Value in accumulator is negative")
-      else:
-        self.ip += 1
+    else:
+      self.ip += 1
+      if verbose:
         print("Value in accumulator is positive")
-    elif instruction[0] == "8":
-      address = int(instruction[1:5])
+
+
+  def executeBRNFImmediate(self, operand, verbose=True):
+    address = operand
+    if verbose:
+      print("Description: Conditional branch to instruction located at address aa if flag NEGATIVE is TRUE.")
+      print("Mnemonic: BRNF aa")
+      print("Machine code: 907aa")
+      print("Addressing: direct")
+      print(f"Address: {address:04d}")
+      print(f"NEGATIVE flag: {self.flags['negative']}")
+    isNegative = self.flags['negative']
+
+    if isNegative:
+      self.ip = address
+      self.cycles += self.branchTakenCycles
+      if verbose:
+        print("NEGATIVE flag is set")
+    else:
+      self.ip += 1
+      if verbose:
+        print("NEGATIVE flag is NOT set")
+
+
+  def executeBRZImmediate(self, operand, verbose=True):
+    address = operand
+    if verbose:
       print("Description: Conditional branch to instruction located at address aaaa if value stored in accumulator is equal to zero.")
       print("Mnemonic: BRZ aaaa")
       print("Machine code: 8aaaa")
       print("Addressing: direct")
       print(f"Address: {address:04d}")
-      print(f"Value in accumulator: {self.acc}")
-      isZero = False
+      print(f"Value in accumulator: {self.wordToBits(self.acc)}")
+    isZero = False
 
-      if self.acc[1:5] == "0000": # I don't care about sign
-        isZero = True
+    if self.acc % 10000 == 0: # I don't care about sign
+      isZero = True
 
-      if isZero:
-        self.ip = address
+    if isZero:
+      self.ip = address
+      self.cycles += self.branchTakenCycles
+      if verbose:
         print("Value in accumulator is equal to zero")
-      else:
-        self.ip += 1
+    else:
+      self.ip += 1
+      if verbose:
         print("Value in accumulator is not equal to zero")
 
-    elif instruction[0] == "9":
-      if instruction[0:3] == "907":
-        address = int(instruction[3:5])
-        print("Description: Conditional branch to instruction located at address aa if flag NEGATIVE is TRUE.")
-        print("Mnemonic: BRNF aa")
-        print("Machine code: 907aa")
-        print("Addressing: direct")
-        print(f"Address: {address:04d}")
-        print(f"NEGATIVE flag: {self.flags['negative']}")
-        isNegative = self.flags['negative']
-
-        if isNegative:
-          self.ip = address
-          print("NEGATIVE flag is set")
-        else:
-          self.ip += 1
-          print("NEGATIVE flag is NOT set")
-      elif instruction[0:3] == "908":
-        address = int(instruction[3:5])
-        print("Description: Conditional branch to instruction located at address aa if flag ZERO is TRUE.")
-        print("Mnemonic: BRZF aa")
-        print("Machine code: 908aa")
-        print("Addressing: direct")
-        print(f"Address: {address:04d}")
-        print(f"NEGATIVE flag: {self.flags['zero']}")
-        isNegative = self.flags['zero']
-
-        if isNegative:
-          self.ip = address
-          print("ZERO flag is set")
-        else:
-          self.ip += 1
-          print("ZERO flag is NOT set")
-      elif instruction == "91030":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        print("Description: Push value at address aaaaa onto the stack, M[aaaaa] -> STACK.")
-        print("Mnemonic: PUSH aaaaa")
-        print("Machine code: 91030 aaaaa")
-        print("Addressing: direct, two byte length")
-        print(f"Value at address {addressBits} as bits: {valueBits}")
-        if self.checkIfStackPointersCorrect('push'):
-          self.sp -= 1
-          self.memory[self.sp] = valueBits
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          print(f"M[SP] as bits: {valueBits}")
-          self.ip += 1
-      elif instruction == "91040":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        print("Description: Pop value from the stack and put at address aaaaa, STACK -> M[aaaaa].")
-        print("Mnemonic: POP aaaaa")
-        print("Machine code: 91040 aaaaa")
-        print("Addressing: direct, two byte length")
-        if self.checkIfStackPointersCorrect('push'):
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          self.memory[address] = valueBits
-          self.sp += 1
-          print(f"Value popped from the stack as bits: {valueBits}")
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          self.ip += 1
-      elif instruction[0:3] == "921":
-        valueBits = instruction[3:5]
-        print("Description: Copy exact value ss to accumulator, A := ss.")
-        print("Mnemonic: CPA (ss)")
-        print("Machine code: 921ss")
-        print("Addressing: immediate, one byte length")
-        print(f"Value: {valueBits}")
-        self.acc = valueBits
-        self.printAccumulatorInfo()
-        self.ip += 1
-      elif instruction == "93030":
-        self.ip += 1
-        valueBits = self.getValueAtAddressAsBits(self.ip)
-        print("Description: Push exact value sssss onto the stack, sssss -> STACK.")
-        print("Mnemonic: PUSH (sssss)")
-        print("Machine code: 93030 sssss")
-        print("Addressing: immediate, two byte length")
-        print(f"Value: {valueBits}")
-        if self.checkIfStackPointersCorrect('push'):
-          self.sp -= 1
-          self.memory[self.sp] = valueBits
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          print(f"M[SP] as bits: {valueBits}")
-          self.ip += 1
-      elif instruction == "93100":
-        self.ip += 1
-        valueBits = self.getValueAtAddressAsBits(self.ip)
-        print("Description: Copy exact value sssss (located in next byte) to accumulator, A := sssss.")
-        print("Mnemonic: CPA (sssss)")
-        print("Machine code: 93100 sssss")
-        print("Addressing: immediate, two byte length")
-        print(f"Value: {valueBits}")
-        self.acc = valueBits
-        self.printAccumulatorInfo()
-        self.ip += 1
-      elif instruction[0:3] == "941":
-        address = int(instruction[3:5])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        print("Description: Copy value from memory at address given in memory at address aa to accumulator, A := M[M[aa]].")
-        print("Mnemonic: CPA [aa]")
-        print("Machine code: 941aa")
-        print("Addressing: indirect, one byte length")
-        print(f"Value: {valueBits}")
-        self.acc = valueBits
-        self.printAccumulatorInfo()
-        self.ip += 1
-      elif instruction == "95030":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        print("Description: Push value at address specified at address aaaaa onto the stack, M[M[aaaaa]] -> STACK.")
-        print("Mnemonic: PUSH [aaaaa]")
-        print("Machine code: 95030 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Value: {valueBits}")
-        if self.checkIfStackPointersCorrect('push'):
-          self.sp -= 1
-          self.memory[self.sp] = valueBits
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          print(f"M[SP] as bits: {valueBits}")
-          self.ip += 1
-      elif instruction == "95040":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        print("Description: Pop value from the stack and put at address specified at address aaaaa, STACK -> M[M[aaaaa]].")
-        print("Mnemonic: POP aaaaa")
-        print("Machine code: 95040 aaaaa")
-        print("Addressing: direct, two byte length")
-        if self.checkIfStackPointersCorrect('pop'):
-          valueBits = self.getValueAtAddressAsBits(self.sp)
-          self.memory[address] = valueBits
-          self.sp += 1
-          print(f"Value popped from the stack as bits: {valueBits}")
-          print(f"BP={self.bp:04d}")
-          print(f"SP={self.sp:04d}")
-          self.ip += 1
-      elif instruction == "95100":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        print("Description: Copy value from memory at address given in memory at address aaaaa to accumulator, A := M[M[aaaaa]].")
-        print("Mnemonic: CPA [aaaaa]")
-        print("Machine code: 95100 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Value: {valueBits}")
-        self.acc = valueBits
-        self.printAccumulatorInfo()
-        self.ip += 1
-      elif instruction[0:3] == "942":
-        address = int(instruction[3:5])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.acc
-        print("Description: Copy value from accumulator to memory at address given in memory at address aa, M[M[aa]] := A.")
-        print("Mnemonic: STO [aa]")
-        print("Machine code: 942aa")
-        print("Addressing: indirect, one byte length")
-        print(f"Store at address {address:04d} value: {valueBits}")
-        self.memory[address] = valueBits
-        self.ip += 1
-      elif instruction == "95200":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.acc
-        print("Description: Copy value from accumulator to memory at address given in memory at address aaaaa, M[M[aaaaa]] := A.")
-        print("Mnemonic: STO [aaaaa]")
-        print("Machine code: 95200 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Store at address {address:04d} value: {valueBits}")
-        self.memory[address] = valueBits
-        self.ip += 1
-      elif instruction[0:3] == "923":
-        valueBits = instruction[3:5]
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Add exact value ss to accumulator. Result is stored in accumulator, A := A + ss.")
-        print("Mnemonic: ADD (ss)")
-        print("Machine code: 923ss")
-        print("Addressing: immediate, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt + valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "93300":
-        self.ip += 1
-        valueBits = self.getValueAtAddressAsBits(self.ip)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Add exact value sssss (located in next byte) to accumulator. Result is stored in accumulator, A := A + sssss.")
-        print("Mnemonic: ADD (sssss)")
-        print("Machine code: 93300 sssss")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt + valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction[0:3] == "943":
-        address = int(instruction[3:5])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Add value from memory at address given in memory at address aa to accumulator, A := A + M[M[aa]].")
-        print("Mnemonic: ADD [aa]")
-        print("Machine code: 943aa")
-        print("Addressing: indirect, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt + valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "95300":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Add value from memory at address given in memory at address aaaaa to accumulator, A := A + M[M[aaaaa]].")
-        print("Mnemonic: ADD [aaaaa]")
-        print("Machine code: 95300 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt + valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction[0:3] == "924":
-        valueBits = instruction[3:5]
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Subtract exact value ss from accumulator. Result is stored in accumulator, A := A - ss.")
-        print("Mnemonic: SUB (ss)")
-        print("Machine code: 924ss")
-        print("Addressing: immediate, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt - valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "93400":
-        self.ip += 1
-        valueBits = self.getValueAtAddressAsBits(self.ip)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Subtract exact value sssss (located in next byte) from accumulator. Result is stored in accumulator, A := A - sssss.")
-        print("Mnemonic: SUB (sssss)")
-        print("Machine code: 93400 sssss")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt - valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction[0:3] == "944":
-        address = int(instruction[3:5])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Subtract value from memory at address given in memory at address aa from accumulator, A := A + M[M[aa]].")
-        print("Mnemonic: SUB [aa]")
-        print("Machine code: 944aa")
-        print("Addressing: indirect, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt - valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "95400":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Subtract value from memory at address given in memory at address aaaaa from accumulator, A := A - M[M[aaaaa]].")
-        print("Mnemonic: SUB [aaaaa]")
-        print("Machine code: 95400 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt - valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction[0:3] == "925":
-        valueBits = instruction[3:5]
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Multiply value from accumulator by exact value ss. Result is stored in accumulator, A := A * ss.")
-        print("Mnemonic: MUL (ss)")
-        print("Machine code: 925ss")
-        print("Addressing: immediate, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt * valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "93500":
-        self.ip += 1
-        valueBits = self.getValueAtAddressAsBits(self.ip)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Multiply value from accumulator by exact value ss (located in next byte). Result is stored in accumulator, A := A * sssss.")
-        print("Mnemonic: MUL (sssss)")
-        print("Machine code: 93500 sssss")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt * valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction[0:3] == "945":
-        address = int(instruction[3:5])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Multiply value from accumulator by value from memory at address given in memory at address aa, A := A * M[M[aa]].")
-        print("Mnemonic: MUL [aa]")
-        print("Machine code: 945aa")
-        print("Addressing: indirect, one byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt * valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
-      elif instruction == "95500":
-        self.ip += 1
-        address = int(self.memory[self.ip])
-        addressBits = self.getValueAtAddressAsBits(address)
-        address = self.bitsToInt(addressBits)
-        valueBits = self.getValueAtAddressAsBits(address)
-        valueInt = self.bitsToInt(valueBits)
-        print("Description: Multiply value from accumulator by value from memory at address given in memory at address aaaaa, A := A * M[M[aaaaa]].")
-        print("Mnemonic: MUL [aaaaa]")
-        print("Machine code: 95500 aaaaa")
-        print("Addressing: indirect, two byte length")
-        print(f"Value as bits: {valueBits}")
-        print(f"Value as int: {self.printIntWithSign(valueInt)}")
-        aInt = self.bitsToInt(self.acc)
-        rInt = aInt * valueInt
-        self.acc = self.intToBits(rInt)
-        self.printAccumulatorInfo()
-        self.updateFlags(self.acc)
-        self.ip += 1
+
+  def executeBRZFImmediate(self, operand, verbose=True):
+    address = operand
+    if verbose:
+      print("Description: Conditional branch to instruction located at address aa if flag ZERO is TRUE.")
+      print("Mnemonic: BRZF aa")
+      print("Machine code: 908aa")
+      print("Addressing: direct")
+      print(f"Address: {address:04d}")
+      print(f"NEGATIVE flag: {self.flags['zero']}")
+    isNegative = self.flags['zero']
+
+    if isNegative:
+      self.ip = address
+      self.cycles += self.branchTakenCycles
+      if verbose:
+        print("ZERO flag is set")
     else:
+      self.ip += 1
+      if verbose:
+        print("ZERO flag is NOT set")
+
+
+  def executeINCDirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    valueIntNew = valueInt + 1
+    valueBitsNew = self.intToWord(valueIntNew)
+    if verbose:
+      print("Description: Increase value at address aaa by 1, M[aaa] := M[aaa] + 1.")
+      print("Mnemonic: INC aaa")
+      print("Machine code: 01aaa")
+      print("Addressing: direct")
+      print(f"Old value at address {address:04d} as bits: {valueBits:05d}")
+      print(f"Old value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
+      print(f"New value at address {address:04d} as bits: {valueBitsNew:05d}")
+      print(f"New value at address {address:04d} as int: {self.printIntWithSign(valueIntNew)}")
+    self.writeMemory(address, valueBitsNew)
+    self.updateFlags(valueBitsNew)
+    self.ip += 1
+
+
+  def executeDECDirect(self, operand, verbose=True):
+    address = operand
+    valueBits = self.memory[address]
+    valueInt = self.wordToInt(valueBits)
+    valueIntNew = valueInt - 1
+    valueBitsNew = self.intToWord(valueIntNew)
+    if verbose:
+      print("Description: Decrease value at address aaa by 1, M[aaa] := M[aaa] - 1.")
+      print("Mnemonic: DEC aaa")
+      print("Machine code: 02aaa")
+      print("Addressing: direct")
+      print(f"Old value at address {address:04d} as bits: {valueBits:05d}")
+      print(f"Old value at address {address:04d} as int: {self.printIntWithSign(valueInt)}")
+      print(f"New value at address {address:04d} as bits: {valueBitsNew:05d}")
+      print(f"New value at address {address:04d} as int: {self.printIntWithSign(valueIntNew)}")
+    self.writeMemory(address, valueBitsNew)
+    self.updateFlags(valueBitsNew)
+    self.ip += 1
+
+
+  def executePUSHNoOperand(self, operand, verbose=True):
+    # When you put something onto the stack (PUSH onto the stack),
+    # the SP is decremented before the item is placed on the stack.
+    if verbose:
+      print("Description: Push value from accumulator onto the stack, A -> STACK.")
+      print("Mnemonic: PUSH")
+      print("Machine code: 03000")
+      print("Addressing: immediate")
+    if self.checkIfStackPointersCorrect('push', verbose):
+      self.sp -= 1
+      self.writeMemory(self.sp, self.acc)
+      valueBits = self.memory[self.sp]
+      if verbose:
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+        print(f"M[SP] as bits: {valueBits:05d}")
+      self.ip += 1
+
+
+  def executePUSHDirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    if verbose:
+      print("Description: Push value at address aaaaa onto the stack, M[aaaaa] -> STACK.")
+      print("Mnemonic: PUSH aaaaa")
+      print("Machine code: 91030 aaaaa")
+      print("Addressing: direct, two byte length")
+      print(f"Value at address {addressBits:05d} as bits: {valueBits:05d}")
+    if self.checkIfStackPointersCorrect('push', verbose):
+      self.sp -= 1
+      self.writeMemory(self.sp, valueBits)
+      valueBits = self.memory[self.sp]
+      if verbose:
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+        print(f"M[SP] as bits: {valueBits:05d}")
+      self.ip += 1
+
+
+  def executePUSHImmediateTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    valueBits = operand
+    if verbose:
+      print("Description: Push exact value sssss onto the stack, sssss -> STACK.")
+      print("Mnemonic: PUSH (sssss)")
+      print("Machine code: 93030 sssss")
+      print("Addressing: immediate, two byte length")
+      print(f"Value: {valueBits:05d}")
+    if self.checkIfStackPointersCorrect('push', verbose):
+      self.sp -= 1
+      self.writeMemory(self.sp, valueBits)
+      valueBits = self.memory[self.sp]
+      if verbose:
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+        print(f"M[SP] as bits: {valueBits:05d}")
+      self.ip += 1
+
+
+  def executePUSHIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    valueBits = self.memory[address]
+    if verbose:
+      print("Description: Push value at address specified at address aaaaa onto the stack, M[M[aaaaa]] -> STACK.")
+      print("Mnemonic: PUSH [aaaaa]")
+      print("Machine code: 95030 aaaaa")
+      print("Addressing: indirect, two byte length")
+      print(f"Value: {valueBits:05d}")
+    if self.checkIfStackPointersCorrect('push', verbose):
+      self.sp -= 1
+      self.writeMemory(self.sp, valueBits)
+      valueBits = self.memory[self.sp]
+      if verbose:
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+        print(f"M[SP] as bits: {valueBits:05d}")
+      self.ip += 1
+
+
+  def executePOPNoOperand(self, operand, verbose=True):
+    # When you take something off of the stack (PULL from the stack),
+    # the SP is incremented after the item is pulled from the stack
+    if verbose:
+      print("Description: Pop value from the stack to accumulator, STACK -> A.")
+      print("Mnemonic: POP")
+      print("Machine code: 04000")
+      print("Addressing: immediate")
+    if self.checkIfStackPointersCorrect('pop', verbose):
+      valueBits = self.memory[self.sp]
+      self.acc = valueBits
+      self.sp += 1
+      if verbose:
+        print(f"Value popped from the stack as bits: {valueBits:05d}")
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+        self.printAccumulatorInfo()
+      self.ip += 1
+
+
+  def executePOPDirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    if verbose:
+      print("Description: Pop value from the stack and put at address aaaaa, STACK -> M[aaaaa].")
+      print("Mnemonic: POP aaaaa")
+      print("Machine code: 91040 aaaaa")
+      print("Addressing: direct, two byte length")
+    if self.checkIfStackPointersCorrect('pop', verbose):
+      valueBits = self.memory[self.sp]
+      self.writeMemory(address, valueBits)
+      self.sp += 1
+      if verbose:
+        print(f"Value popped from the stack as bits: {valueBits:05d}")
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+      self.ip += 1
+
+
+  def executePOPIndirectTwoByte(self, operand, verbose=True):
+    self.ip += 1
+    address = operand
+    addressBits = self.memory[address]
+    address = self.wordToInt(addressBits)
+    if verbose:
+      print("Description: Pop value from the stack and put at address specified at address aaaaa, STACK -> M[M[aaaaa]].")
+      print("Mnemonic: POP aaaaa")
+      print("Machine code: 95040 aaaaa")
+      print("Addressing: direct, two byte length")
+    if self.checkIfStackPointersCorrect('pop', verbose):
+      valueBits = self.memory[self.sp]
+      self.writeMemory(address, valueBits)
+      self.sp += 1
+      if verbose:
+        print(f"Value popped from the stack as bits: {valueBits:05d}")
+        print(f"BP={self.bp:04d}")
+        print(f"SP={self.sp:04d}")
+      self.ip += 1
+
+
+  def executeUnknown(self, operand, verbose=True):
+    if verbose:
       print("Unknown instruction")
-      self.halted = True
+    self.fault = "Unknown instruction"
+    self.halted = True
 
 
+  @classmethod
+  def registerInstruction(cls, opcode, condition, handler, cycles=None):
+    # New opcode may be added without touching executeInstruction.
+    # Handler is called as handler(vsc, operand, verbose).
+    # Cycles are used if the cost model doesn't know the opcode,
+    # by default it costs as much as an unknown instruction.
+    cls.instructionForms[opcode] = condition
+    cls.dispatchTable[opcode] = handler
+    if cycles is not None:
+      cls.registeredCycles[opcode] = cycles
 
-  def executeProgram(self):
-    safety = 100
-    while True:
-      self.executeInstruction()
-      if self.halted:
-        break
-      safety -= 1
 
-    if safety == 0:
+  def executeProgram(self, maxSteps=100, maxSeconds=None):
+    if self.halted and self.programInMemory:
+      print("Program execution halted. Please do reset")
+      return
+    result = self.run(maxSteps=maxSteps, maxSeconds=maxSeconds, verbose=True)
+
+    if result["reason"] == "noProgram":
+      print("There is no program in memory")
+    elif result["reason"] == "budget":
       print("Maximum iteration limit reached.")
       print("If your program is not halted, repeat -run command.")
 
 
+  def executeProgramQuiet(self, maxSteps=None, summary=False):
+    # The same state transitions as executeProgram but nothing is printed
+    # and no string is formatted for a trace. Execution stops when machine
+    # is halted or after maxSteps instructions (if maxSteps is given).
+    result = self.run(maxSteps=maxSteps)
+
+    state = self.getState()
+    if summary:
+      state["summary"] = {"steps": result["steps"],
+                          "halted": bool(self.halted),
+                          "reason": result["reason"]}
+    return state
+
+
+  def run(self, maxSteps=None, maxSeconds=None, verbose=False, jit=None):
+    # Execute instructions until the machine halts or one of the budgets
+    # is exhausted: maxSteps instructions or maxSeconds of wall-clock time.
+    # Both budgets are counted from the beginning of this call, so
+    # a program stopped by a budget continues with the next call of run.
+    # Returned reason is one of:
+    # halted - HLT instruction was executed,
+    # budget - instruction or time budget is exhausted,
+    # fault  - general protection fault, unknown instruction or other
+    #          error, details are in self.fault,
+    # breakpoint - ip is at one of self.breakpoints (the instruction is not
+    #          executed; the next call of run starts with it),
+    # watchpoint - one of self.watchpoints was written, details are in
+    #          self.watchHit,
+    # noProgram - there is nothing to execute.
+    # With jit (default self.jit) instructions are executed by compiled
+    # basic blocks (see vscjit) unless verbose output, profile, trace,
+    # history, breakpoints or watchpoints need every single step.
+    steps = 0
+    reason = None
+    deadline = None
+    clockCheck = 0
+    blockBegin = None # self.steps before the compiled block being executed
+    if maxSeconds is not None:
+      deadline = time.perf_counter() + maxSeconds
+
+    if not self.programInMemory:
+      return {"reason": "noProgram", "steps": 0}
+    if self.halted is None:
+      self.halted = False
+
+    dispatchTable = self.dispatchTable
+    decodedCache = self.decoded
+    profile = self.profile
+    trace = self.trace
+    history = self.history
+    breakpoints = self.breakpoints
+    watching = bool(self.watchpoints)
+    self.watchHit = None
+    if jit is None:
+      jit = self.jit
+    jit = (jit and not verbose and profile is None and trace is None and history is None
+           and not breakpoints and not watching)
+    if profile is not None:
+      addressCounts = profile["addresses"]
+      opcodeCounts = profile["opcodes"]
+      takenCounts = profile["taken"]
+      notTakenCounts = profile["notTaken"]
+    try:
+      while True:
+        if self.halted:
+          reason = "fault" if self.fault else "halted"
+          break
+        if maxSteps is not None and steps >= maxSteps:
+          reason = "budget"
+          break
+        # Checking the clock is expensive, do it once per 1024 instructions.
+        if deadline is not None and steps >= clockCheck:
+          clockCheck = steps + 1024
+          if time.perf_counter() >= deadline:
+            reason = "budget"
+            break
+        if breakpoints and steps and self.ip in breakpoints:
+          reason = "breakpoint"
+          break
+
+        if jit:
+          # Compiled blocks one after another, as long as they fit
+          # into the budgets and the machine is running
+          blocks = self.blocks
+          memory = self.memory
+          limit = maxSteps
+          if deadline is not None:
+            limit = clockCheck if maxSteps is None else min(clockCheck, maxSteps)
+          while True:
+            block = blocks.get(self.ip)
+            if block is None:
+              block = self.getBlock(self.ip)
+            if not block or (limit is not None and steps + block[1] > limit):
+              break
+            self.blocksChanged = False
+            blockBegin = self.steps
+            steps += block[0](self, memory)
+            if self.halted:
+              break
+          blockBegin = None
+          if self.halted or (limit is not None and steps >= limit):
+            continue
+          # Not compiled instruction or a block longer than the rest of the budget
+          decoded = decodedCache[self.ip]
+          if decoded is None:
+            decoded = self.decodeInstruction(self.ip)
+          self.steps += 1
+          self.cycles += decoded[3]
+          dispatchTable[decoded[0]](self, decoded[1], False)
+        elif verbose:
+          self.executeInstruction(verbose=True)
+        elif trace is not None:
+          self.executeInstruction(verbose=False)
+        elif profile is None:
+          if history is not None:
+            self.recordHistory()
+          decoded = decodedCache[self.ip]
+          if decoded is None:
+            decoded = self.decodeInstruction(self.ip)
+          self.steps += 1
+          self.cycles += decoded[3]
+          dispatchTable[decoded[0]](self, decoded[1], False)
+        else: # The same as above, but counted
+          if history is not None:
+            self.recordHistory()
+          address = self.ip
+          decoded = decodedCache[address]
+          if decoded is None:
+            decoded = self.decodeInstruction(address)
+          opcode = decoded[0]
+          self.steps += 1
+          self.cycles += decoded[3]
+          addressCounts[address] += 1
+          opcodeCounts[opcode] = opcodeCounts.get(opcode, 0) + 1
+          dispatchTable[opcode](self, decoded[1], False)
+          if opcode in branchOpcodes:
+            if self.ip != address + decoded[2]:
+              takenCounts[address] += 1
+            else:
+              notTakenCounts[address] += 1
+        steps += 1
+        if watching and self.watchHit is not None:
+          reason = "watchpoint"
+          break
+    except (IndexError, TypeError) as e:
+      # For example instruction pointer beyond the memory or
+      # arithmetic on the accumulator which was never set.
+      if blockBegin is not None:
+        # Instructions of the block before the faulting one
+        steps += self.steps - blockBegin - 1
+      self.fault = f"Error at address {self.ip}: {e}"
+      self.halted = True
+      reason = "fault"
+      if verbose:
+        print("!!! General protection fault !!!")
+        print(self.fault)
+        print("Machine halted")
+
+    return {"reason": reason, "steps": steps}
+
+
+  def setCostModel(self, model):
+    # model is a dictionary like defaultCostModel,
+    # missing keys are taken from defaultCostModel.
+    model = {**defaultCostModel, **model}
+    self.cycleCosts = getCycleCosts(model)
+    self.branchTakenCycles = model["branchTaken"]
+    # Costs are kept in decoded instructions and compiled blocks
+    self.decoded = [None] * self.memorySize
+    self.clearBlocks()
+
+
+  def startProfile(self):
+    # From now on run and executeInstruction count executions of every
+    # address and opcode and taken branches (see getProfileReport).
+    self.profile = {"addresses": [0] * self.memorySize, "opcodes": {},
+                    "taken": [0] * self.memorySize, "notTaken": [0] * self.memorySize}
+
+
+  def stopProfile(self):
+    profile = self.profile
+    self.profile = None
+    return profile
+
+
+  def startTrace(self, path, chunkSize=1<<20):
+    # From now on every executed instruction is recorded in the trace file
+    # at path (see traceHeaderFormat), instead of being printed. Steps are
+    # collected in a buffer and written in chunks of chunkSize bytes.
+    # The file starts with the current registers and memory, so vsctrace.py
+    # can replay the run.
+    try:
+      fileDst = open(path, "wb")
+    except OSError as e:
+      print(f"Cannot create trace file {path}: {e}")
+      return False
+
+    opcodes = sorted(self.dispatchTable)
+    flags = (1 if self.flags["zero"] else 0) | (2 if self.flags["negative"] else 0)
+    acc = -1 if self.acc is None else self.acc
+    ip = -1 if self.ip is None else self.ip
+    names = "\0".join(opcodes).encode("ascii")
+    fileDst.write(traceHeaderFormat.pack(traceMagic, traceVersion, self.memorySize, len(names),
+                                         acc, ip, self.sp, self.bp, flags))
+    fileDst.write(names)
+    memory = self.memory
+    if sys.byteorder != "little":
+      memory = array('i', memory)
+      memory.byteswap()
+    fileDst.write(memory.tobytes())
+
+    self.trace = {"file": fileDst, "buffer": bytearray(), "chunkSize": chunkSize,
+                  "opcodes": {opcode: i for i, opcode in enumerate(opcodes)}, "steps": 0}
+    return True
+
+
+  def stopTrace(self):
+    # Write the rest of the buffer and close the trace file.
+    # Returns the number of recorded steps.
+    trace = self.trace
+    if trace is None:
+      return 0
+    trace["file"].write(trace["buffer"])
+    trace["file"].close()
+    self.trace = None
+    return trace["steps"]
+
+
+  def startHistory(self, interval=1000, limit=100000):
+    # From now on executed instructions can be undone with back.
+    # Registers before every instruction and old values of written memory
+    # cells are recorded, and a snapshot is taken every interval
+    # instructions. At least the last limit instructions are kept.
+    # history["checkpoints"][j] is the state before history["deltas"][j*interval].
+    self.history = {"interval": interval, "limit": limit, "deltas": [],
+                    "writes": [], "writesBase": 0, "checkpoints": []}
+
+
+  def stopHistory(self):
+    self.history = None
+
+
+  def recordHistory(self):
+    # Called before every instruction when history is recorded.
+    history = self.history
+    deltas = history["deltas"]
+    interval = history["interval"]
+    if len(deltas) == len(history["checkpoints"]) * interval:
+      history["checkpoints"].append(self.snapshot())
+      if len(deltas) > history["limit"] + interval:
+        # Forget the oldest interval of instructions
+        writesEnd = deltas[interval][7] - history["writesBase"]
+        del history["writes"][:writesEnd]
+        history["writesBase"] += writesEnd
+        del deltas[:interval]
+        del history["checkpoints"][0]
+    deltas.append((self.acc, self.ip, self.sp, self.bp, self.flags["zero"], self.flags["negative"],
+                   self.cycles, history["writesBase"] + len(history["writes"])))
+
+
+  def back(self, n):
+    # Undo the last n instructions (or less if history is shorter).
+    # Up to interval instructions are undone one by one, otherwise the
+    # nearest checkpoint before the target is restored and instructions
+    # after it are executed again, so it never takes more than interval
+    # instructions. Returns the number of undone instructions.
+    history = self.history
+    if history is None:
+      return 0
+    deltas = history["deltas"]
+    writes = history["writes"]
+    interval = history["interval"]
+    n = min(n, len(deltas))
+    if n == 0:
+      return 0
+    target = len(deltas) - n
+
+    if n > interval:
+      j = target // interval
+      begin = j * interval
+      if begin < len(deltas):
+        del writes[deltas[begin][7] - history["writesBase"]:]
+      del deltas[begin:]
+      del history["checkpoints"][j+1:]
+      self.restore(history["checkpoints"][j])
+
+      # Nothing can stop or observe execution of the same instructions again.
+      saved = (self.breakpoints, self.watchpoints, self.profile, self.trace)
+      self.breakpoints, self.watchpoints, self.profile, self.trace = set(), set(), None, None
+      self.run(maxSteps=target-begin)
+      self.breakpoints, self.watchpoints, self.profile, self.trace = saved
+      return n
+
+    for i in range(n):
+      acc, ip, sp, bp, zero, negative, cycles, writesBegin = deltas.pop()
+      for k in range(len(writes) - 1, writesBegin - history["writesBase"] - 1, -1):
+        address, value = writes[k]
+        self.memory[address] = value
+        self.decoded[address] = None
+        if address > 0:
+          self.decoded[address-1] = None
+        self.dirtyPages.add(address // self.pageSize)
+        if address in self.blockCells:
+          self.invalidateBlocks(address)
+      del writes[writesBegin - history["writesBase"]:]
+      self.acc, self.ip, self.sp, self.bp = acc, ip, sp, bp
+      self.flags = {"zero": zero, "negative": negative}
+      self.cycles = cycles
+      self.steps -= 1
+    self.halted = False
+    self.fault = None
+    # Checkpoints after the current instruction are not valid anymore
+    del history["checkpoints"][len(deltas) // interval + 1:]
+    return n
+
+
+  def getEffectiveAddress(self, opcode, operand):
+    # Address used by instruction: the operand of direct instructions and
+    # branches, the address read from memory for indirect ones and for
+    # PUSH aaaaa (its handler reads M[M[aaaaa]]), -1 if none.
+    i = instructionsByOpcode.get(opcode)
+    if i is None or operand is None:
+      return -1
+    pointer = i["addressing"] == "indirect" or (i["mnemonic"] == "PUSH" and len(opcode) == 5
+                                                and i["addressing"] == "direct")
+    if pointer:
+      if operand < self.memorySize:
+        return self.wordToInt(self.memory[operand])
+    elif i["addressing"] == "direct" or i["mnemonic"] in branchMnemonics:
+      return operand
+    return -1
+
+
+  def recordStep(self, address, opcode, effectiveAddress, accBefore):
+    trace = self.trace
+    flags = (1 if self.flags["zero"] else 0) | (2 if self.flags["negative"] else 0)
+    trace["buffer"] += traceStepFormat.pack(address, trace["opcodes"][opcode], effectiveAddress,
+                                            -1 if accBefore is None else accBefore,
+                                            -1 if self.acc is None else self.acc, flags)
+    trace["steps"] += 1
+    if len(trace["buffer"]) >= trace["chunkSize"]:
+      trace["file"].write(trace["buffer"])
+      trace["buffer"].clear()
+
+
+  def getState(self):
+    return {"acc": self.acc, "ip": self.ip, "sp": self.sp, "bp": self.bp,
+            "flags": dict(self.flags), "halted": self.halted,
+            "fault": self.fault, "steps": self.steps, "cycles": self.cycles}
+
+
 
   def load(self, path):
     parts = path.split(".")
@@ -769,6 +1533,60 @@ class VSC:
       self.programInMemory = self.loadMC(path)
       if self.programInMemory:
         self.halted = False
+    elif extension == "mcb":
+      self.programInMemory = self.loadMCB(path)
+      if self.programInMemory:
+        self.halted = False
+
+
+  def loadRecords(self, records):
+    # Load mc records {"address", "value", ...} returned by mca2mc
+    # or asm2mc.assemble, without any text on the way.
+    for r in records:
+      address = int(r["address"])
+      if address <0 or address >= self.memorySize:
+        print(f"Address out of range (0,{self.memorySize-1})")
+        return False
+      self.writeMemory(address, int(r["value"]))
+
+    self.programInMemory = True
+    self.halted = False
+    return True
+
+
+  def loadMCB(self, path):
+    # Runs of words are copied from the memory mapped file straight
+    # into memory, there is no text to parse.
+    mapped, mcb = openMCB(path)
+    if mapped is None:
+      return False
+
+    loaded = False
+    if mcb is not None:
+      memoryView = memoryview(self.memory)
+      loaded = True
+      for address, words in mcb["runs"]:
+        end = address + len(words)
+        if end > self.memorySize:
+          print(f"Address out of range (0,{self.memorySize-1})")
+          loaded = False
+          break
+        if len(words) and (min(words) < 0 or max(words) > 99999):
+          print(f"Incorrect word in run at address {address:04d}")
+          loaded = False
+          break
+        memoryView[address:end] = words
+        # The same as writeMemory for every cell of the run
+        self.decoded[max(address-1, 0):end] = [None] * (end - max(address-1, 0))
+        self.dirtyPages.update(range(address // self.pageSize, (end-1) // self.pageSize + 1))
+        self.clearBlocks()
+      for address, words in mcb["runs"]:
+        words.release()
+      memoryView.release()
+      if loaded:
+        self.symbols = mcb["symbols"]
+    mapped.close()
+    return loaded
 
 
   def loadMC(self, path):
@@ -809,7 +1627,7 @@ class VSC:
               print(f"Address out of range (0,{self.memorySize-1})")
               return False
 
-            self.memory[address] = instruction
+            self.writeMemory(address, int(instruction))
           else:
             print(f"Incorrect address ({address}) or instruction ({instruction}) in the following line:")
             print(l)
@@ -821,6 +1639,74 @@ class VSC:
     return False
 
 
+def getHandlerName(instruction):
+  addressing = instruction["addressing"]
+  name = "execute" + instruction["mnemonic"] + addressing[0].upper() + addressing[1:]
+  if len(instruction["opcode"]) == 5 and instruction["condition"]:
+    name += "TwoByte"
+  return name
+
+
+def getCycleCosts(model):
+  # Cycles of every form of instruction, opcode -> cycles:
+  # instruction
+  # + secondByte if the operand is in the second byte
+  # + memoryAccess for every access to memory other than the instruction
+  #   itself, for example 2 for M[M[aa]] or for INC which reads and writes
+  # + extra cycles of the mnemonic from model["mnemonics"].
+  # Cycles given in model["opcodes"] replace the computed ones.
+  # A taken branch costs model["branchTaken"] more, it is added by
+  # the branch instruction.
+  costs = {"unknown": model["instruction"]}
+  for i in getInstructions():
+    accesses = {"direct": 1, "indirect": 2}.get(i["addressing"], 0)
+    if i["mnemonic"] in {"INC", "DEC", "PUSH", "POP"}:
+      accesses += 1 # read and write or access to the stack
+    cycles = model["instruction"] + model["memoryAccess"] * accesses
+    if len(i["opcode"]) == 5 and i["condition"]:
+      cycles += model["secondByte"]
+    cycles += model["mnemonics"].get(i["mnemonic"], 0)
+    costs[i["opcode"]] = model["opcodes"].get(i["opcode"], cycles)
+  return costs
+
+
+# Trace file, all numbers are little endian:
+# header: magic "VSCT", version, memory size, length of opcode names,
+#         acc, ip, sp, bp (-1 if not set), flags (bit 0 zero, bit 1 negative),
+# opcode names separated by "\0", memory (int32 per cell),
+# steps:  ip, index of opcode name, effective address (-1 if none),
+#         acc before and after the instruction (-1 if not set), flags after.
+traceMagic = b"VSCT"
+traceVersion = 1
+traceHeaderFormat = struct.Struct("<4sHHIiiiiB")
+traceStepFormat = struct.Struct("<HBiiiB")
+
+
+defaultCostModel = {"instruction": 1, "secondByte": 1, "memoryAccess": 1,
+                    "branchTaken": 1, "mnemonics": {"MUL": 3}, "opcodes": {}}
+
+
+def loadCostModel(path):
+  # Read cost model from JSON file, returns None if it cannot be read.
+  try:
+    with open(path, encoding="utf8") as fileSrc:
+      model = json.load(fileSrc)
+  except (OSError, ValueError) as e:
+    print(f"Cannot load cost model from {path}: {e}")
+    return None
+  if not isinstance(model, dict) or set(model) - set(defaultCostModel):
+    print(f"Cost model may contain only: {', '.join(defaultCostModel)}")
+    return None
+  return model
+
+
+for i in getInstructions():
+  VSC.registerInstruction(i["opcode"], i["condition"], getattr(VSC, getHandlerName(i)))
+VSC.dispatchTable["unknown"] = VSC.executeUnknown
+VSC.cycleCosts = getCycleCosts(defaultCostModel)
+VSC.branchTakenCycles = defaultCostModel["branchTaken"]
+
+
 def processCommandLine(commandsLine, listOfSwitch):
   #if len(sys.argv) == 1:
   #  return
@@ -893,9 +1779,128 @@ def parseRanges(args):
 
   return ranges
 
+def parseRunBudget(commandsDict):
+  # Returns (maxSteps, maxSeconds) from -limit and -time switches,
+  # None if any of them is not a number.
+  maxSteps = None
+  maxSeconds = None
+  if '-limit' in commandsDict:
+    args = commandsDict['-limit']
+    if not (args and len(args) == 1 and args[0].isnumeric()):
+      return None
+    maxSteps = int(args[0])
+  if '-time' in commandsDict:
+    args = commandsDict['-time']
+    if not (args and len(args) == 1 and re.fullmatch(r"\d+(\.\d*)?", args[0])):
+      return None
+    maxSeconds = float(args[0])
+  return (maxSteps, maxSeconds)
+
+def printRunResult(vsc, result):
+  reason = result["reason"]
+  if reason == "halted":
+    print(f"Program halted after {result['steps']} instructions ({vsc.cycles} cycles in total)")
+  elif reason == "budget":
+    print(f"Budget exhausted after {result['steps']} instructions ({vsc.cycles} cycles in total)")
+    print("If your program is not halted, repeat -run command.")
+  elif reason == "fault":
+    print(f"Program stopped by fault after {result['steps']} instructions")
+    print(vsc.fault)
+  elif reason == "breakpoint":
+    print(f"Breakpoint at address {vsc.ip:04d} {getLabel(vsc.ip, sortedSymbols(vsc.symbols)) or ''}")
+    print(f"Stopped after {result['steps']} instructions ({vsc.cycles} cycles in total)")
+  elif reason == "watchpoint":
+    hit = vsc.watchHit
+    print(f"Watchpoint: M[{hit['address']:04d}] changed from {hit['old']:05d} to {hit['new']:05d}"
+          f" by instruction at address {hit['ip']:04d}")
+    print(f"Stopped after {result['steps']} instructions ({vsc.cycles} cycles in total)")
+  else:
+    print("There is no program in memory")
+    return
+  vsc.printRegisters(vsc.getInstructionRegister())
+
+def getLabel(address, labels):
+  # Name of address built from the nearest label placed before it,
+  # for example loop+2. labels is a sorted list of (address, label).
+  name = None
+  for a, label in labels:
+    if a > address:
+      break
+    name = label if a == address else f"{label}+{address-a}"
+  return name
+
+
+def sortedSymbols(symbols):
+  # symbols {label: address} as a sorted list of (address, label), see getLabel
+  return sorted((int(a), label) for label, a in (symbols or {}).items())
+
+
+def parseAddresses(args, symbols):
+  # Addresses given as numbers, labels from symbols {label: address}
+  # or labels with offset, for example loop+2 (see getLabel).
+  # Returns None if any of them is not correct.
+  addresses = []
+  for a in args:
+    label, _, offset = a.partition("+")
+    if a.isnumeric():
+      address = int(a)
+    elif label in symbols and (offset.isnumeric() or not _):
+      address = int(symbols[label]) + int(offset or 0)
+    else:
+      address = None
+    if address is None or address >= VSC.memorySize:
+      print(f"{a} is neither an address nor a label")
+      return None
+    addresses.append(address)
+  return addresses
+
+
+def getProfileReport(profile, symbols=None):
+  # Convert profile collected by VSC into a report which can be saved
+  # as JSON. Addresses are mapped to labels if symbols {label: address}
+  # are available (they are loaded from mcb files).
+  labels = sortedSymbols(symbols)
+  addresses = []
+  for address, count in enumerate(profile["addresses"]):
+    if count:
+      row = {"address": f"{address:04d}", "label": getLabel(address, labels), "count": count}
+      if profile["taken"][address] or profile["notTaken"][address]:
+        row["taken"] = profile["taken"][address]
+        row["notTaken"] = profile["notTaken"][address]
+      addresses.append(row)
+
+  opcodes = []
+  for opcode, count in sorted(profile["opcodes"].items(), key=lambda o: -o[1]):
+    i = instructionsByOpcode.get(opcode)
+    if i is None:
+      opcodes.append({"opcode": opcode, "mnemonic": None, "addressing": None,
+                      "bytes": 1, "count": count})
+    else:
+      opcodes.append({"opcode": opcode, "mnemonic": i["mnemonic"], "addressing": i["addressing"],
+                      "bytes": 2 if len(opcode) == 5 and i["condition"] else 1, "count": count})
+
+  return {"addresses": addresses, "opcodes": opcodes}
+
+
+def printProfileReport(report):
+  print("Address  Label            Count      Taken  Not taken")
+  for r in report["addresses"]:
+    line = f"{r['address']}     {r['label'] or '':16.16} {r['count']:10d}"
+    if "taken" in r:
+      line += f" {r['taken']:10d} {r['notTaken']:10d}"
+    print(line)
+  print()
+  print("Opcode Mnemonic Addressing Bytes      Count")
+  for r in report["opcodes"]:
+    print(f"{r['opcode']:6} {r['mnemonic'] or '?':8} {r['addressing'] or '':10} {r['bytes']:5d} {r['count']:10d}")
+
+
 def mainLoop():
   lastCommand = ""
   vsc = VSC()
+  # Recording history slows down every instruction, so it is off until -history on
+  historyOn = False
+  snapshot = None
 
   while(True):
     line = input("> ")
@@ -906,8 +1911,10 @@ def mainLoop():
       lastCommand = line
 
     commandsList = line.split()
-    listOfSwitch = ["-exit", "-h", "-load", "-memory", "-reset", "-run",
-                     "-show", "-stack", "-startAddr", "-step"]
+    listOfSwitch = ["-back", "-break", "-clear", "-costModel", "-exit", "-h", "-history", "-jit", "-limit",
+                    "-load", "-memory", "-profile", "-quiet", "-reset", "-restore",
+                    "-run", "-show", "-snapshot", "-stack", "-startAddr", "-step",
+                    "-time", "-trace", "-watch"]
     commandsDict = processCommandLine(commandsList, listOfSwitch)
 
     #print(commandsDict)
@@ -916,24 +1923,147 @@ def mainLoop():
       break
     elif '-h' in commandsDict:
       printCommandHelp()
+    elif '-break' in commandsDict:
+      args = commandsDict['-break']
+      if '-clear' in commandsDict:
+        vsc.breakpoints.clear()
+        print("All breakpoints removed.")
+      elif args:
+        addresses = parseAddresses(args, vsc.symbols)
+        if addresses is not None:
+          vsc.breakpoints.update(addresses)
+      labels = sortedSymbols(vsc.symbols)
+      for a in sorted(vsc.breakpoints):
+        print(f"Breakpoint at address {a:04d} {getLabel(a, labels) or ''}")
+    elif '-watch' in commandsDict:
+      args = commandsDict['-watch']
+      if '-clear' in commandsDict:
+        vsc.watchpoints.clear()
+        print("All watchpoints removed.")
+      elif args:
+        for r in parseRanges(args):
+          if r["type"] == "number":
+            vsc.watchpoints.add(r["position"])
+          else:
+            vsc.watchpoints.update(range(r["begin"], r["end"]+1))
+      for a in sorted(vsc.watchpoints):
+        print(f"Watchpoint at address {a:04d}")
+    elif '-history' in commandsDict:
+      args = commandsDict['-history']
+      if args == ["on"]:
+        historyOn = True
+        vsc.startHistory()
+        print("History is recorded, -run -back undoes instructions executed from now on.")
+      elif args == ["off"]:
+        historyOn = False
+        vsc.stopHistory()
+        print("History is not recorded.")
+      else:
+        print("Use -history on or -history off. Type -h for help if you need it.")
+    elif '-costModel' in commandsDict:
+      args = commandsDict['-costModel']
+      if args and len(args) == 1:
+        model = loadCostModel(args[0])
+        if model is not None:
+          vsc.setCostModel(model)
+          print(f"Cost model loaded from: {args[0]}")
+      else:
+        print("Are you sure that you provide a PATH? Type -h for help if you need it.")
     elif '-load' in commandsDict: # tutu
       args = commandsDict['-load']
       if args and len(args) == 1:
         path = args[0]
         vsc.load(path)
+        if historyOn:
+          vsc.startHistory()
         print(f"Program loaded from: {path}")
       else:
         print("Are you sure that you provide a PATH? Type -h for help if you need it.")
     elif '-reset' in commandsDict:
       vsc.reset()
+      if historyOn:
+        vsc.startHistory()
       print("Set memory and registers to zeros. Done.")
+    elif '-snapshot' in commandsDict:
+      snapshot = vsc.snapshot()
+      print("Memory and registers saved.")
+    elif '-restore' in commandsDict:
+      if snapshot is None:
+        print("There is no snapshot. Use -snapshot first.")
+      else:
+        vsc.restore(snapshot)
+        if historyOn:
+          vsc.startHistory()
+        print("Memory and registers restored from the snapshot.")
     elif '-run' in commandsDict:
-      if '-step' in commandsDict:
+      if '-back' in commandsDict:
+        args = commandsDict['-back']
+        if not (args and len(args) == 1 and args[0].isnumeric()):
+          print("Are you sure that you provide a number of STEPS? Type -h for help if you need it.")
+          continue
+        if not historyOn:
+          print("History is not recorded. Use -history on before -run.")
+          continue
+        n = vsc.back(int(args[0]))
+        print(f"Went back {n} instructions")
+        vsc.printRegisters(vsc.getInstructionRegister())
+      elif '-step' in commandsDict:
         print("Executing one instruction")
         vsc.executeInstruction()
       else:
-        print("Executing code (max. 100 instructions)")
-        vsc.executeProgram()
+        budget = parseRunBudget(commandsDict)
+        if budget is None:
+          print("Budget must be a number. Type -h for help if you need it.")
+          continue
+        maxSteps, maxSeconds = budget
+        if '-trace' in commandsDict:
+          tracePath = commandsDict['-trace']
+          if not (tracePath and len(tracePath) == 1):
+            print("Are you sure that you provide a PATH? Type -h for help if you need it.")
+            continue
+          if not vsc.startTrace(tracePath[0]):
+            continue
+        if '-profile' in commandsDict:
+          vsc.startProfile()
+        # Between breakpoints and watchpoints program is executed quietly,
+        # trace is recorded instead of printing.
+        if ('-quiet' in commandsDict or '-trace' in commandsDict
+            or vsc.breakpoints or vsc.watchpoints):
+          if maxSteps is None and maxSeconds is None:
+            maxSeconds = 10
+          print("Executing code quietly")
+          if '-jit' in commandsDict:
+            # Compiled blocks don't record history, it starts again after them
+            vsc.stopHistory()
+            result = vsc.run(maxSteps=maxSteps, maxSeconds=maxSeconds, jit=True)
+            if historyOn:
+              vsc.startHistory()
+          else:
+            result = vsc.run(maxSteps=maxSteps, maxSeconds=maxSeconds)
+          printRunResult(vsc, result)
+        else:
+          if maxSteps is None and maxSeconds is None:
+            maxSteps = 100
+          if maxSteps is None:
+            print(f"Executing code (max. {maxSeconds:g} seconds)")
+          else:
+            print(f"Executing code (max. {maxSteps} instructions)")
+          vsc.executeProgram(maxSteps, maxSeconds)
+        if '-trace' in commandsDict:
+          steps = vsc.stopTrace()
+          print(f"Trace of {steps} instructions saved to: {tracePath[0]}")
+        if '-profile' in commandsDict:
+          report = getProfileReport(vsc.stopProfile(), vsc.symbols)
+          args = commandsDict['-profile']
+          if args:
+            try:
+              with open(args[0], "w", encoding="utf8") as fileDst:
+                json.dump(report, fileDst, indent=2)
+              print(f"Profile saved to: {args[0]}")
+            except OSError as e:
+              print(f"Cannot save profile to {args[0]}: {e}")
+          else:
+            printProfileReport(report)
     elif '-show' in commandsDict:  # tutu
       if '-memory' in commandsDict:
         args = commandsDict['-memory']
@@ -958,6 +2088,8 @@ def mainLoop():
         address = args[0]
         if address.isnumeric():
           vsc.setStartAddr(int(address))
+          if historyOn:
+            vsc.startHistory()
           print(f"Starting at address: {address}")
         else:
           print("Addres must be a number")
@@ -982,24 +2114,65 @@ Type -h and confirm with ENTER for help.
 def printCommandHelp():
   text = \
 '''
+-break ADDRESS...    - stop -run before executing instruction at ADDRESS,
+                       ADDRESS may be a label or label+offset if the program
+                       was loaded from a .mcb file; without ADDRESS list
+                       breakpoints
+-break -clear        - remove all breakpoints
+-costModel PATH      - load cycle costs of instructions from JSON file,
+                       for example {"secondByte": 2, "mnemonics": {"MUL": 5}};
+                       keys: instruction, secondByte, memoryAccess,
+                       branchTaken, mnemonics, opcodes
 -exit                - exit from VSCA
 -h                   - print help
--load PATH           - load code from PATH
+-history on|off      - record executed instructions, so they can be undone
+                       with -run -back (default: off, recording makes
+                       execution slower)
+-load PATH           - load code from PATH (.mc or .mcb)
 -reset               - set memory and registers to zeros
--run                 - execute program
+-restore             - restore memory and registers saved by -snapshot
+-run                 - execute program (max. 100 instructions)
 -run -step           - execute one step of program
+-run -back STEPS     - undo the last STEPS instructions, at most 100000
+                       executed since -history on, -load, -reset, -restore
+                       or -startAddr
+-run -limit STEPS    - execute program (max. STEPS instructions)
+-run -time SECONDS   - execute program for at most SECONDS seconds
+-run -quiet          - execute program without printing every instruction,
+                       only the final state is printed; can be combined
+                       with -limit and -time (default: 10 seconds)
+-run -quiet -jit     - the same, but straight-line code between branches
+                       is compiled into Python functions, which is much
+                       faster; it is not used with -trace, -profile,
+                       breakpoints or watchpoints and instructions executed
+                       this way cannot be undone with -run -back
+-run                 - with breakpoints or watchpoints the program is
+                       executed quietly until one of them is hit
+-run -trace PATH     - record every executed instruction in binary file PATH
+                       instead of printing it, use vsctrace.py to read it;
+                       can be combined with other options
+-run -profile [PATH] - count executions of every address and opcode and
+                       taken branches, print them as a table or save them
+                       as JSON to PATH; can be combined with other options
 -show -labels        - show all labels (not implemented)
 -show -labels LABELS - show selected LABELS (not implemented)
 -show -memory RANGE  - show memory cells from RANGR
 -show -stack         - print the stack
+-snapshot            - save memory and registers, for example after -load
+                       and -startAddr, to run the program again with -restore
 -startAddr ADDRESS   - set instruction pointer to address ADDRESS;
                        this way you specify instruction which
                        should be executed as next
+-watch RANGE         - stop -run after an instruction writes to memory
+                       cells from RANGE; without RANGE list watchpoints
+-watch -clear        - remove all watchpoints
 ADDRESS              - decimal number from 0 to 9999
 LABELS               -
 PATH                 - path to program you want to execute
 RANGE                - example: 1, 5, 10-15 specify numbers 1, 5 and all
                        numbers from 10 to 15
+SECONDS              - decimal number, for example 2.5
+STEPS                - decimal number
 
 ENTER                - press ENTER to repeat last command
 '''
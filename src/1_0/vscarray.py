@@ -0,0 +1,435 @@
+import contextlib
+import io
+import json
+import sys
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+from instructions import getInstructions
+from vsc import VSC, parseRanges, parseRunBudget, processCommandLine
+
+# Many VSC machines executing the same program in lockstep, for example
+# one program for thousands of different inputs.
+#
+# State of all machines is kept in NumPy arrays: memory is a matrix with
+# one row per machine, registers are vectors. Every step decodes the
+# instruction of every running machine, groups machines by instruction
+# and executes each group with vectorized operations. Results are the same
+# as those of VSC.run for every machine, only texts of faults caused by
+# Python exceptions in VSC (addresses beyond memory, accumulator which was
+# never set) are different.
+maxWord = 99999
+unknownForm = len(getInstructions()) # index of "unknown" in decode tables
+
+
+def wordToInt(words):
+  # The same as VSC.wordToInt for arrays
+  return np.where(words < 10000, words, -(words % 10000))
+
+
+def intToWord(integers):
+  # The same as VSC.intToWord for arrays
+  return np.where(integers < 0, 10000 + (-integers) % 10000, integers % 10000)
+
+
+def getDecodeTables(cycleCosts):
+  # Tables indexed by a word 0..99999, the same decoding as
+  # VSC.decodeInstruction: index of the instruction in getInstructions()
+  # (unknownForm for unknown words) and operand of one byte instructions.
+  # Opcodes are not prefixes of one another, so every word matches
+  # at most one instruction.
+  forms = np.full(maxWord+1, unknownForm, dtype=np.int16)
+  operands = np.zeros(maxWord+1, dtype=np.int64)
+  for k, i in enumerate(getInstructions()):
+    n = len(i["opcode"])
+    base = int(i["opcode"]) * 10**(5-n)
+    if n == 5:
+      forms[base] = k
+      continue
+    size = 10**(5-n)
+    operand = np.arange(size, dtype=np.int64)
+    if i["condition"][0] == "s":
+      # The first digit is the sign of the value
+      valueSize = 10**(4-n)
+      operand = operand % valueSize + np.where(operand // valueSize != 0, 10000, 0)
+    forms[base:base+size] = k
+    operands[base:base+size] = operand
+
+  lengths = np.array([2 if len(i["opcode"]) == 5 and i["condition"] else 1
+                      for i in getInstructions()] + [1], dtype=np.int64)
+  cycles = np.array([cycleCosts[i["opcode"]] for i in getInstructions()]
+                    + [cycleCosts["unknown"]], dtype=np.int64)
+  return {"forms": forms, "operands": operands, "lengths": lengths, "cycles": cycles}
+
+
+class VSCArray:
+  # acc is -1 if it was not set (None in VSC), fault is a list of texts
+  # (None if there is no fault).
+
+  def __init__(self, vsc, n):
+    # n copies of the state of vsc, including memory and cycle costs
+    if np is None:
+      raise ImportError("VSCArray needs NumPy, install it with: pip install numpy")
+    self.memorySize = vsc.memorySize
+    self.n = n
+    self.memory = np.tile(np.frombuffer(vsc.memory, dtype=np.int32), (n, 1))
+    self.acc = np.full(n, -1 if vsc.acc is None else vsc.acc, dtype=np.int64)
+    self.ip = np.full(n, vsc.ip, dtype=np.int64)
+    self.sp = np.full(n, vsc.sp, dtype=np.int64)
+    self.bp = np.full(n, vsc.bp, dtype=np.int64)
+    self.zero = np.full(n, vsc.flags["zero"], dtype=bool)
+    self.negative = np.full(n, vsc.flags["negative"], dtype=bool)
+    self.halted = np.full(n, bool(vsc.halted), dtype=bool)
+    self.fault = [vsc.fault] * n
+    self.steps = np.full(n, vsc.steps, dtype=np.int64)
+    self.cycles = np.full(n, vsc.cycles, dtype=np.int64)
+    self.branchTakenCycles = vsc.branchTakenCycles
+    self.tables = getDecodeTables(vsc.cycleCosts)
+    self.instructions = getInstructions()
+    self.dispatchTable = {"HLT": self.executeHLT, "CPA": self.executeCPA,
+                          "STO": self.executeSTO, "ADD": self.executeArithmetic,
+                          "SUB": self.executeArithmetic, "MUL": self.executeArithmetic,
+                          "BRA": self.executeBranch, "BRN": self.executeBranch,
+                          "BRNF": self.executeBranch, "BRZ": self.executeBranch,
+                          "BRZF": self.executeBranch, "INC": self.executeINCDEC,
+                          "DEC": self.executeINCDEC, "PUSH": self.executePUSH,
+                          "POP": self.executePOP}
+
+
+  def run(self, maxSteps=None):
+    # Execute instructions of all machines which are not halted until
+    # all of them halt or maxSteps steps are done. Returns the number
+    # of steps; machines which halted earlier executed fewer instructions.
+    tables = self.tables
+    steps = 0
+    rows = np.flatnonzero(~self.halted)
+    while rows.size and (maxSteps is None or steps < maxSteps):
+      ip = self.ip[rows]
+      valid = self.checkAddresses(rows, ip)
+      rows, ip = rows[valid], ip[valid]
+      words = self.memory[rows, ip % self.memorySize]
+      forms = np.where((words >= 0) & (words <= maxWord),
+                       tables["forms"][np.clip(words, 0, maxWord)], unknownForm).astype(np.int64)
+      # Operand of two byte instruction is in the next cell, if there is one
+      twoByte = tables["lengths"][forms] == 2
+      forms[twoByte & (ip + 1 >= self.memorySize)] = unknownForm
+      twoByte = tables["lengths"][forms] == 2
+      operands = tables["operands"][np.clip(words, 0, maxWord)]
+      operands[twoByte] = self.memory[rows[twoByte], (ip[twoByte] + 1) % self.memorySize]
+      self.steps[rows] += 1
+      self.cycles[rows] += tables["cycles"][forms]
+
+      for form in np.unique(forms):
+        selected = forms == form
+        r = rows[selected]
+        if form == unknownForm:
+          self.setFault(r, "Unknown instruction")
+          continue
+        i = self.instructions[form]
+        if tables["lengths"][form] == 2:
+          self.ip[r] += 1
+        self.dispatchTable[i["mnemonic"]](r, operands[selected], i)
+
+      steps += 1
+      rows = rows[~self.halted[rows]]
+    return steps
+
+
+  def setFault(self, rows, text):
+    self.halted[rows] = True
+    for r in rows:
+      self.fault[r] = text
+
+
+  def checkAddresses(self, rows, addresses):
+    # The same addresses as Python indexes of VSC.memory are correct,
+    # machines with other addresses get a fault. Returns mask of correct ones.
+    valid = (addresses >= -self.memorySize) & (addresses < self.memorySize)
+    for r in rows[~valid]:
+      self.halted[r] = True
+      self.fault[r] = f"Error at address {self.ip[r]}: memory address out of range"
+    return valid
+
+
+  def checkAcc(self, rows):
+    # Mask of machines with the accumulator set, others get a fault
+    valid = self.acc[rows] >= 0
+    for r in rows[~valid]:
+      self.halted[r] = True
+      self.fault[r] = f"Error at address {self.ip[r]}: accumulator is not set"
+    return valid
+
+
+  def readIndirect(self, rows, operands):
+    # Address stored at operand, as VSC does: wordToInt(memory[operand]).
+    # Returns (rows, addresses) of machines without a fault.
+    valid = self.checkAddresses(rows, operands)
+    rows = rows[valid]
+    addresses = wordToInt(self.memory[rows, operands[valid]].astype(np.int64))
+    return (rows, addresses % self.memorySize)
+
+
+  def getValue(self, rows, operands, addressing):
+    # Value of the operand (word) of CPA, ADD, SUB, MUL and PUSH.
+    # Returns (rows, values) of machines without a fault.
+    if addressing == "immediate":
+      return (rows, operands)
+    if addressing == "direct":
+      return (rows, self.memory[rows, operands].astype(np.int64))
+    rows, addresses = self.readIndirect(rows, operands)
+    return (rows, self.memory[rows, addresses].astype(np.int64))
+
+
+  def setFlags(self, rows, words):
+    # The same as VSC.updateFlags for words created by intToWord
+    self.zero[rows] = words % 10000 == 0
+    self.negative[rows] = words > 10000
+
+
+  def executeHLT(self, rows, operands, i):
+    self.halted[rows] = True
+
+
+  def executeCPA(self, rows, operands, i):
+    rows, values = self.getValue(rows, operands, i["addressing"])
+    self.acc[rows] = values
+    self.ip[rows] += 1
+
+
+  def executeSTO(self, rows, operands, i):
+    if i["addressing"] == "direct":
+      addresses = operands
+    else:
+      rows, addresses = self.readIndirect(rows, operands)
+    valid = self.checkAcc(rows)
+    rows = rows[valid]
+    self.memory[rows, addresses[valid]] = self.acc[rows]
+    self.ip[rows] += 1
+
+
+  def executeArithmetic(self, rows, operands, i):
+    rows, values = self.getValue(rows, operands, i["addressing"])
+    valid = self.checkAcc(rows)
+    rows = rows[valid]
+    a = wordToInt(self.acc[rows])
+    b = wordToInt(values[valid])
+    if i["mnemonic"] == "ADD":
+      result = a + b
+    elif i["mnemonic"] == "SUB":
+      result = a - b
+    else:
+      result = a * b
+    self.acc[rows] = intToWord(result)
+    self.setFlags(rows, self.acc[rows])
+    self.ip[rows] += 1
+
+
+  def executeBranch(self, rows, operands, i):
+    mnemonic = i["mnemonic"]
+    if mnemonic in {"BRN", "BRZ"}:
+      valid = self.checkAcc(rows)
+      rows, operands = rows[valid], operands[valid]
+    if mnemonic == "BRA":
+      taken = np.ones(rows.size, dtype=bool)
+    elif mnemonic == "BRN":
+      taken = self.acc[rows] >= 10000
+    elif mnemonic == "BRZ":
+      taken = self.acc[rows] % 10000 == 0
+    elif mnemonic == "BRNF":
+      taken = self.negative[rows]
+    else:
+      taken = self.zero[rows]
+    self.ip[rows] = np.where(taken, operands, self.ip[rows] + 1)
+    self.cycles[rows[taken]] += self.branchTakenCycles
+
+
+  def executeINCDEC(self, rows, operands, i):
+    step = 1 if i["mnemonic"] == "INC" else -1
+    words = intToWord(wordToInt(self.memory[rows, operands].astype(np.int64)) + step)
+    self.memory[rows, operands] = words
+    self.setFlags(rows, words)
+    self.ip[rows] += 1
+
+
+  def checkStack(self, rows, operationType):
+    # The same as VSC.checkIfStackPointersCorrect, returns mask of
+    # machines which can push or pop
+    sp = self.sp[rows]
+    if operationType == "push":
+      valid = sp - 1 >= 0
+      self.setFault(rows[~valid], "No free space on stack")
+      return valid
+    bp = self.bp[rows]
+    empty = sp == bp
+    beyond = ~empty & (sp + 1 > bp)
+    self.setFault(rows[empty], "Access violation, stack is empty")
+    self.setFault(rows[beyond], "Access violation, try to reach beyond the stack base")
+    return ~(empty | beyond)
+
+
+  def executePUSH(self, rows, operands, i):
+    addressing = i["addressing"]
+    if addressing == "noOperand":
+      values = self.acc[rows]
+    else:
+      # PUSH direct reads the address from the operand, like PUSH indirect
+      rows, values = self.getValue(rows, operands, "indirect" if addressing == "direct" else addressing)
+    valid = self.checkStack(rows, "push")
+    rows, values = rows[valid], values[valid]
+    self.sp[rows] -= 1
+    if addressing == "noOperand":
+      valid = self.checkAcc(rows)
+      rows, values = rows[valid], values[valid]
+    self.memory[rows, self.sp[rows]] = values
+    self.ip[rows] += 1
+
+
+  def executePOP(self, rows, operands, i):
+    addressing = i["addressing"]
+    if addressing == "indirect":
+      rows, operands = self.readIndirect(rows, operands)
+    valid = self.checkStack(rows, "pop")
+    rows, operands = rows[valid], operands[valid]
+    values = self.memory[rows, self.sp[rows]]
+    if addressing == "noOperand":
+      self.acc[rows] = values
+    else:
+      valid = self.checkAddresses(rows, operands)
+      rows, operands, values = rows[valid], operands[valid] % self.memorySize, values[valid]
+      self.memory[rows, operands] = values
+    self.sp[rows] += 1
+    self.ip[rows] += 1
+
+
+  def getState(self, k):
+    # State of machine k, the same as VSC.getState
+    acc = int(self.acc[k])
+    return {"acc": None if acc < 0 else acc, "ip": int(self.ip[k]), "sp": int(self.sp[k]),
+            "bp": int(self.bp[k]),
+            "flags": {"zero": bool(self.zero[k]), "negative": bool(self.negative[k])},
+            "halted": bool(self.halted[k]), "fault": self.fault[k],
+            "steps": int(self.steps[k]), "cycles": int(self.cycles[k])}
+
+
+def readInputs(lines):
+  # Every line is JSON {address: word} with memory cells of one machine,
+  # the same form as "memory" in output of vscbatch.py. Returns list
+  # of dictionaries {address (int): word (int)} or None.
+  inputs = []
+  for n, l in enumerate(lines, 1):
+    if not l.strip():
+      continue
+    try:
+      cells = json.loads(l)
+      cells = {int(a): int(w) for a, w in cells.items()}
+    except (ValueError, AttributeError) as e:
+      print(f"Incorrect input in line {n}: {e}")
+      return None
+    for address, word in cells.items():
+      if not 0 <= address < VSC.memorySize:
+        print(f"Incorrect input in line {n}: address {address} out of range (0,{VSC.memorySize-1})")
+        return None
+      if not 0 <= word <= maxWord:
+        print(f"Incorrect input in line {n}: word {word} out of range (00000,{maxWord})")
+        return None
+    inputs.append(cells)
+  return inputs
+
+
+def runInputs(path, startAddr, inputs, ranges, maxSteps):
+  # Execute program from path once for every input (see readInputs).
+  # Returns list of results, one per input, like vscbatch.runProgram,
+  # or None if the program cannot be loaded.
+  vsc = VSC(memoryPolicy="lazy")
+  messages = io.StringIO()
+  with contextlib.redirect_stdout(messages):
+    vsc.reset()
+    vsc.load(path)
+  if not vsc.programInMemory:
+    print(messages.getvalue(), end="")
+    print(f"Cannot load program from: {path}")
+    return None
+  vsc.setStartAddr(startAddr)
+  machines = VSCArray(vsc, len(inputs))
+  for k, cells in enumerate(inputs):
+    for address, word in cells.items():
+      machines.memory[k, address] = word
+  machines.run(maxSteps)
+
+  addresses = []
+  for r in ranges:
+    if r["type"] == "number":
+      addresses.append(r["position"])
+    else:
+      addresses.extend(range(r["begin"], r["end"]+1))
+  addresses = [a for a in addresses if 0 <= a < vsc.memorySize]
+  results = []
+  for k in range(len(inputs)):
+    state = machines.getState(k)
+    reason = ("fault" if state["fault"] else "halted") if state["halted"] else "budget"
+    memory = {f"{a:04d}": vsc.wordToBits(int(machines.memory[k, a])) for a in addresses}
+    results.append({"reason": reason, "fault": state["fault"], "steps": state["steps"],
+                    "cycles": state["cycles"], "acc": vsc.wordToBits(state["acc"]),
+                    "ip": state["ip"], "sp": state["sp"], "flags": state["flags"],
+                    "memory": memory})
+  return results
+
+
+def printUsage():
+  text = \
+'''
+Usage: py vscarray.py -path PATH -startAddr ADDRESS -inputs PATH
+                      [-memory RANGE] [-limit STEPS]
+
+-path PATH           - .mc or .mcb file to execute
+-startAddr ADDRESS   - address of the first instruction
+-inputs PATH         - file with one JSON line for every execution of the
+                       program, memory cells set before it starts,
+                       example: {"0101": "00003", "0102": "10002"}
+-memory RANGE        - memory cells reported for every execution,
+                       example: 1, 5, 10-15
+-limit STEPS         - stop every execution after STEPS instructions
+                       (default: 1000000)
+
+All executions run together in NumPy arrays, which is much faster than
+one VSC for every input. Every execution is printed as one line of JSON,
+the same as in vscbatch.py.
+'''
+
+  print(text)
+
+
+if __name__ == '__main__':
+  listOfSwitch = ["-inputs", "-limit", "-memory", "-path", "-startAddr"]
+  commandsDict = processCommandLine(sys.argv[1:], listOfSwitch)
+
+  path = commandsDict.get('-path')
+  startAddr = commandsDict.get('-startAddr')
+  inputsPath = commandsDict.get('-inputs')
+  budget = parseRunBudget(commandsDict)
+  if (not path or len(path) != 1 or not startAddr or len(startAddr) != 1
+      or not startAddr[0].isnumeric() or not inputsPath or len(inputsPath) != 1
+      or budget is None or budget[1] is not None):
+    printUsage()
+    sys.exit(1)
+  if np is None:
+    print("vscarray.py needs NumPy, install it with: pip install numpy")
+    sys.exit(1)
+
+  maxSteps = budget[0]
+  if maxSteps is None:
+    maxSteps = 1000000
+  with open(inputsPath[0], encoding="utf8") as fileSrc:
+    inputs = readInputs(fileSrc)
+  if inputs is None:
+    sys.exit(1)
+  ranges = parseRanges(commandsDict.get('-memory') or [])
+
+  results = runInputs(path[0], int(startAddr[0]), inputs, ranges, maxSteps)
+  if results is None:
+    sys.exit(1)
+  for result in results:
+    print(json.dumps(result))
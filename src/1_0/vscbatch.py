@@ -0,0 +1,131 @@
+import contextlib
+import io
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from vsc import VSC, getProfileReport, loadCostModel, processCommandLine, parseRanges, parseRunBudget
+
+
+def getPaths(args):
+  # Every argument is a .mc or .mcb file or a directory with such files.
+  paths = []
+  for a in args:
+    if os.path.isdir(a):
+      for name in sorted(os.listdir(a)):
+        if name.endswith((".mc", ".mcb")):
+          paths.append(os.path.join(a, name))
+    else:
+      paths.append(a)
+  return paths
+
+
+def runProgram(path, startAddr, ranges, maxSteps, maxSeconds, profile=False, costModel=None,
+               jit=False):
+  # Memory is reset before loading, so random memory would never be used.
+  vsc = VSC(memoryPolicy="lazy")
+  if costModel is not None:
+    vsc.setCostModel(costModel)
+  messages = io.StringIO()
+  # Messages printed by VSC would mix with JSON lines of other programs.
+  with contextlib.redirect_stdout(messages):
+    vsc.reset()
+    vsc.load(path)
+    vsc.setStartAddr(startAddr)
+    if profile:
+      vsc.startProfile()
+    result = vsc.run(maxSteps=maxSteps, maxSeconds=maxSeconds, jit=jit)
+
+  memory = {}
+  for r in ranges:
+    if r["type"] == "number":
+      addresses = [r["position"]]
+    else:
+      addresses = range(r["begin"], r["end"]+1)
+    for a in addresses:
+      if 0 <= a < vsc.memorySize:
+        memory[f"{a:04d}"] = vsc.wordToBits(vsc.memory[a])
+
+  output = {"path": path, "reason": result["reason"], "fault": vsc.fault,
+            "steps": vsc.steps, "cycles": vsc.cycles, "acc": vsc.wordToBits(vsc.acc),
+            "ip": vsc.ip, "sp": vsc.sp, "flags": dict(vsc.flags),
+            "memory": memory, "messages": messages.getvalue().splitlines()}
+  if profile:
+    output["profile"] = getProfileReport(vsc.stopProfile(), vsc.symbols)
+  return output
+
+
+def runBatch(paths, startAddr, ranges=None, maxSteps=None, maxSeconds=None, jobs=None,
+             profile=False, costModel=None, jit=False):
+  # Programs are executed in a pool of processes, one process per core
+  # unless jobs is given. Results are yielded in the order of paths.
+  n = len(paths)
+  ranges = ranges or []
+  with ProcessPoolExecutor(max_workers=jobs) as executor:
+    yield from executor.map(runProgram, paths, [startAddr]*n, [ranges]*n,
+                            [maxSteps]*n, [maxSeconds]*n, [profile]*n, [costModel]*n,
+                            [jit]*n,
+                            chunksize=max(1, n // (4 * (jobs or os.cpu_count() or 1))))
+
+
+def printUsage():
+  text = \
+'''
+Usage: py vscbatch.py -path PATH... -startAddr ADDRESS [-memory RANGE]
+                      [-limit STEPS] [-time SECONDS] [-jobs N] [-profile]
+                      [-costModel PATH] [-jit]
+
+-path PATH...        - .mc or .mcb files or directories with them to execute
+-startAddr ADDRESS   - address of the first instruction of every program
+-memory RANGE        - memory cells reported for every program,
+                       example: 1, 5, 10-15
+-limit STEPS         - stop every program after STEPS instructions
+                       (default: 1000000)
+-time SECONDS        - stop every program after SECONDS seconds
+-jobs N              - number of processes (default: number of cores)
+-profile             - add execution counts of every address and opcode
+                       and taken branches to the result
+-costModel PATH      - cycle costs of instructions (JSON, see vsc.py -h)
+-jit                 - compile straight-line code between branches into
+                       Python functions, results are the same but long
+                       running programs are much faster; not used with
+                       -profile
+
+Every program is printed as one line of JSON with the reason why it
+stopped (halted, budget, fault), accumulator, flags, number of executed
+instructions, number of cycles and values of the selected memory cells.
+'''
+
+  print(text)
+
+
+if __name__ == '__main__':
+  listOfSwitch = ["-costModel", "-jit", "-jobs", "-limit", "-memory", "-path", "-profile",
+                  "-startAddr", "-time"]
+  commandsDict = processCommandLine(sys.argv[1:], listOfSwitch)
+
+  startAddr = commandsDict.get('-startAddr')
+  jobs = commandsDict.get('-jobs', ["0"])
+  budget = parseRunBudget(commandsDict)
+  if (not commandsDict.get('-path') or not startAddr or len(startAddr) != 1
+      or not startAddr[0].isnumeric() or not jobs or not jobs[0].isnumeric()
+      or budget is None):
+    printUsage()
+    sys.exit(1)
+
+  maxSteps, maxSeconds = budget
+  if maxSteps is None:
+    maxSteps = 1000000
+  ranges = parseRanges(commandsDict.get('-memory') or [])
+  costModel = None
+  if commandsDict.get('-costModel'):
+    costModel = loadCostModel(commandsDict['-costModel'][0])
+    if costModel is None:
+      sys.exit(1)
+  paths = getPaths(commandsDict['-path'])
+
+  for result in runBatch(paths, int(startAddr[0]), ranges, maxSteps, maxSeconds,
+                         int(jobs[0]) or None, '-profile' in commandsDict, costModel,
+                         '-jit' in commandsDict):
+    print(json.dumps(result), flush=True)
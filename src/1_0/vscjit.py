@@ -0,0 +1,172 @@
+from instructions import branchMnemonics, instructionsByOpcode
+
+# Translation of basic blocks of VSC machine code into Python functions.
+#
+# A block starts at any address and ends with a branch or HLT, before an
+# instruction which is not translated (PUSH, POP, unknown) or after
+# maxBlockLength instructions. All instructions of a block are executed by
+# one call of the generated function, without decoding and dispatching
+# every instruction. The function keeps acc and flags in local variables,
+# adds steps and cycles once and returns the number of executed
+# instructions. The result is exactly the same as execution by handlers
+# of VSC, including faults: ip, steps and cycles are set as if the handler
+# of the faulting instruction raised the exception.
+#
+# Blocks are used only when there are no watchpoints and no history, so
+# stores do the rest of VSC.writeMemory in place: they clear decoded
+# instructions, mark the page dirty and invalidate blocks containing the
+# written cell. If any block is invalidated, the block stops after the store.
+maxBlockLength = 64
+translatedMnemonics = {"CPA", "STO", "ADD", "SUB", "MUL", "INC", "DEC", "HLT"} | branchMnemonics
+
+
+def wordToInt(x):
+  # The same as VSC.wordToInt, as an expression
+  return f"({x} if {x} < 10000 else -({x} % 10000))"
+
+
+def intToWord(x):
+  # The same as VSC.intToWord, as an expression
+  return f"(10000 + (-{x}) % 10000 if {x} < 0 else {x} % 10000)"
+
+
+def getStoreCode(address, value, pageSize):
+  # The same as VSC.writeMemory without watchpoints and history,
+  # address is a number or a variable
+  code = [f"memory[{address}] = {value}", f"decoded[{address}] = None"]
+  if isinstance(address, int):
+    if address > 0:
+      code.append(f"decoded[{address-1}] = None")
+    code.append(f"dirtyPages.add({address // pageSize})")
+  else:
+    code += [f"if {address} > 0:", f"  decoded[{address}-1] = None",
+             f"dirtyPages.add({address} // {pageSize})"]
+  code += [f"if {address} in blockCells:", f"  vsc.invalidateBlocks({address})"]
+  return code
+
+
+def getOperandCode(addressing, operand):
+  # Code which puts value of the operand (as integer) into v
+  if addressing == "direct":
+    return [f"v = memory[{operand}]", f"v = {wordToInt('v')}"]
+  elif addressing == "immediate":
+    v = operand if operand < 10000 else -(operand % 10000)
+    return [f"v = {v}"]
+  return [f"p = memory[{operand}]", f"v = memory[{wordToInt('p')}]", f"v = {wordToInt('v')}"]
+
+
+def compileBlock(vsc, start):
+  # Returns (function, number of instructions, memory cells of the block)
+  # or None if the instruction at start is not translated.
+  code = []
+  faultIps = [] # ip when instruction k raises an exception
+  cycles = [] # cycles of instructions 0..k
+  cells = []
+  address = start
+  terminator = None
+
+  while len(faultIps) < maxBlockLength and address < vsc.memorySize:
+    decoded = vsc.decoded[address]
+    if decoded is None:
+      decoded = vsc.decodeInstruction(address)
+    opcode, operand, length, cost = decoded
+    i = instructionsByOpcode.get(opcode)
+    if i is None or i["mnemonic"] not in translatedMnemonics:
+      break
+
+    k = len(faultIps)
+    mnemonic = i["mnemonic"]
+    addressing = i["addressing"]
+    nextAddress = address + length
+    # Handlers of two byte instructions increment ip before anything can fail
+    faultIps.append(address + 1 if length == 2 else address)
+    cycles.append((cycles[-1] if cycles else 0) + cost)
+    cells.extend(range(address, nextAddress))
+    code.append(f"k = {k} # {address:04d} {mnemonic} {addressing}")
+    # Leave the block if the store has changed any block
+    storeExit = ["if vsc.blocksChanged:",
+                 "  vsc.acc = acc; flags['zero'] = fz; flags['negative'] = fn",
+                 f"  vsc.ip = {nextAddress}; vsc.steps += {k+1}; vsc.cycles += {cycles[-1]}",
+                 f"  return {k+1}"]
+
+    if mnemonic == "CPA":
+      if addressing == "direct":
+        code.append(f"acc = memory[{operand}]")
+      elif addressing == "immediate":
+        code.append(f"acc = {operand}")
+      else:
+        code += [f"p = memory[{operand}]", f"acc = memory[{wordToInt('p')}]"]
+    elif mnemonic == "STO":
+      if addressing == "direct":
+        code += getStoreCode(operand, "acc", vsc.pageSize)
+      else:
+        code += [f"p = memory[{operand}]", f"p = {wordToInt('p')}"]
+        code += getStoreCode("p", "acc", vsc.pageSize)
+      code += storeExit
+    elif mnemonic in {"ADD", "SUB", "MUL"}:
+      operator = {"ADD": "+", "SUB": "-", "MUL": "*"}[mnemonic]
+      code += getOperandCode(addressing, operand)
+      code += [f"r = {wordToInt('acc')} {operator} v",
+               f"acc = {intToWord('r')}",
+               "fz = acc % 10000 == 0",
+               "fn = acc > 10000"]
+    elif mnemonic in {"INC", "DEC"}:
+      operator = "+" if mnemonic == "INC" else "-"
+      code += [f"v = memory[{operand}]",
+               f"r = {wordToInt('v')} {operator} 1",
+               f"w = {intToWord('r')}"]
+      code += getStoreCode(operand, "w", vsc.pageSize)
+      code += ["fz = w % 10000 == 0",
+               "fn = w > 10000"]
+      code += storeExit
+    else:
+      terminator = (mnemonic, operand, nextAddress)
+      if mnemonic == "BRA":
+        code.append("taken = True")
+      elif mnemonic == "BRN":
+        code.append("taken = not acc < 10000")
+      elif mnemonic == "BRZ":
+        code.append("taken = acc % 10000 == 0")
+      elif mnemonic == "BRNF":
+        code.append("taken = fn")
+      elif mnemonic == "BRZF":
+        code.append("taken = fz")
+      address = nextAddress
+      break
+    address = nextAddress
+
+  n = len(faultIps)
+  if n == 0:
+    return None
+
+  source = [f"def block(vsc, memory, faultIps={tuple(faultIps)}, cycles={tuple(cycles)}):",
+            "  acc = vsc.acc",
+            "  flags = vsc.flags",
+            "  decoded = vsc.decoded",
+            "  dirtyPages = vsc.dirtyPages",
+            "  blockCells = vsc.blockCells",
+            "  fz = flags['zero']",
+            "  fn = flags['negative']",
+            "  try:"]
+  source += ["    " + line for line in code]
+  source += ["  except (IndexError, TypeError):",
+             "    vsc.acc = acc; flags['zero'] = fz; flags['negative'] = fn",
+             "    vsc.ip = faultIps[k]; vsc.steps += k + 1; vsc.cycles += cycles[k]",
+             "    raise",
+             "  vsc.acc = acc; flags['zero'] = fz; flags['negative'] = fn",
+             f"  vsc.steps += {n}; vsc.cycles += {cycles[-1]}"]
+  if terminator is None:
+    source.append(f"  vsc.ip = {address}")
+  elif terminator[0] == "HLT":
+    source += [f"  vsc.ip = {address - 1}", "  vsc.halted = True"]
+  else:
+    mnemonic, target, nextAddress = terminator
+    source += ["  if taken:",
+               f"    vsc.ip = {target}; vsc.cycles += {vsc.branchTakenCycles}",
+               "  else:",
+               f"    vsc.ip = {nextAddress}"]
+  source.append(f"  return {n}")
+
+  namespace = {}
+  exec(compile("\n".join(source), f"<block {start:04d}>", "exec"), namespace)
+  return (namespace["block"], n, tuple(cells))
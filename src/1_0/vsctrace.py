@@ -0,0 +1,159 @@
+import sys
+from array import array
+
+from instructions import instructionsByOpcode
+from vsc import (VSC, parseRanges, processCommandLine, traceHeaderFormat,
+                 traceMagic, traceStepFormat, traceVersion)
+
+
+def openTrace(path):
+  # Read header of trace file written by VSC.startTrace.
+  # Returns (file, header) with file positioned at the first step
+  # or (None, None) if the file is not a trace.
+  try:
+    fileSrc = open(path, "rb")
+  except OSError as e:
+    print(f"Cannot open trace file {path}: {e}")
+    return (None, None)
+
+  data = fileSrc.read(traceHeaderFormat.size)
+  if len(data) < traceHeaderFormat.size:
+    print(f"File {path} is too short to be a trace")
+    fileSrc.close()
+    return (None, None)
+  tag, version, memorySize, namesLength, acc, ip, sp, bp, flags = traceHeaderFormat.unpack(data)
+  if tag != traceMagic or version != traceVersion:
+    print(f"File {path} is not a trace or its version is not supported")
+    fileSrc.close()
+    return (None, None)
+
+  opcodes = fileSrc.read(namesLength).decode("ascii").split("\0")
+  memory = array('i')
+  memory.frombytes(fileSrc.read(4*memorySize))
+  if sys.byteorder != "little":
+    memory.byteswap()
+
+  header = {"acc": None if acc < 0 else acc, "ip": None if ip < 0 else ip,
+            "sp": sp, "bp": bp, "flags": {"zero": bool(flags & 1), "negative": bool(flags & 2)},
+            "opcodes": opcodes, "memory": memory}
+  return (fileSrc, header)
+
+
+def readSteps(fileSrc, opcodes, chunkSize=1<<20):
+  # Generator of recorded steps:
+  # {"ip", "opcode", "effectiveAddress", "accBefore", "accAfter", "flags"},
+  # addresses and accumulator are None if not set.
+  size = traceStepFormat.size
+  chunkSize -= chunkSize % size
+  while True:
+    data = fileSrc.read(chunkSize)
+    data = data[:len(data) - len(data) % size]
+    if not data:
+      return
+    for ip, opcode, effectiveAddress, accBefore, accAfter, flags in traceStepFormat.iter_unpack(data):
+      yield {"ip": ip, "opcode": opcodes[opcode],
+             "effectiveAddress": None if effectiveAddress < 0 else effectiveAddress,
+             "accBefore": None if accBefore < 0 else accBefore,
+             "accAfter": None if accAfter < 0 else accAfter,
+             "flags": {"zero": bool(flags & 1), "negative": bool(flags & 2)}}
+
+
+def inRanges(address, ranges):
+  # ranges are returned by parseRanges, no ranges means all addresses
+  if not ranges:
+    return True
+  for r in ranges:
+    if r["type"] == "number":
+      if address == r["position"]:
+        return True
+    elif r["begin"] <= address <= r["end"]:
+      return True
+  return False
+
+
+def formatStep(step):
+  i = instructionsByOpcode.get(step["opcode"])
+  mnemonic = f"{i['mnemonic']} {i['addressing']}" if i else "unknown"
+  effective = "" if step["effectiveAddress"] is None else f"{step['effectiveAddress']:04d}"
+  accBefore = "-----" if step["accBefore"] is None else f"{step['accBefore']:05d}"
+  accAfter = "-----" if step["accAfter"] is None else f"{step['accAfter']:05d}"
+  flags = "".join(f for f, name in (("Z", "zero"), ("N", "negative")) if step["flags"][name])
+  return f"{step['ip']:04d} {mnemonic:20} {effective:5} {accBefore} -> {accAfter} {flags}"
+
+
+def printSteps(path, ranges):
+  fileSrc, header = openTrace(path)
+  if fileSrc is None:
+    return False
+  with fileSrc:
+    print("IP   Instruction          EA    A before    after Flags")
+    for step in readSteps(fileSrc, header["opcodes"]):
+      if inRanges(step["ip"], ranges):
+        print(formatStep(step))
+  return True
+
+
+def replay(path, ranges):
+  # Execute the recorded program again from the state saved in the trace
+  # and print the same output as -run does for steps at addresses
+  # from ranges. Every step is compared with the trace.
+  fileSrc, header = openTrace(path)
+  if fileSrc is None:
+    return False
+
+  vsc = VSC(memoryPolicy="lazy")
+  vsc.memory = header["memory"]
+  vsc.acc = header["acc"]
+  vsc.ip = header["ip"]
+  vsc.sp = header["sp"]
+  vsc.bp = header["bp"]
+  vsc.flags = header["flags"]
+  vsc.programInMemory = True
+  vsc.halted = False
+
+  with fileSrc:
+    for n, step in enumerate(readSteps(fileSrc, header["opcodes"]), 1):
+      if vsc.ip != step["ip"]:
+        print(f"Replay differs from the trace at step {n}: IP = {vsc.ip}, recorded {step['ip']}")
+        return False
+      vsc.executeInstruction(verbose=inRanges(step["ip"], ranges))
+      if vsc.acc != step["accAfter"]:
+        print(f"Replay differs from the trace at step {n}: A = {vsc.acc}, recorded {step['accAfter']}")
+        return False
+  return True
+
+
+def printUsage():
+  text = \
+'''
+Usage: py vsctrace.py -path TRACE [-address RANGE] [-replay]
+
+-path TRACE          - trace file recorded with -run -trace TRACE in vsc.py
+-address RANGE       - only instructions located at addresses from RANGE,
+                       example: 1, 5, 10-15
+-replay              - execute the program again and print the same output
+                       as -run prints for every instruction; without it one
+                       line is printed for every instruction: address,
+                       instruction, effective address, accumulator before
+                       and after and flags (Z - zero, N - negative)
+'''
+
+  print(text)
+
+
+if __name__ == '__main__':
+  listOfSwitch = ["-address", "-path", "-replay"]
+  commandsDict = processCommandLine(sys.argv[1:], listOfSwitch)
+
+  path = commandsDict.get('-path')
+  if not path or len(path) != 1:
+    printUsage()
+    sys.exit(1)
+
+  ranges = parseRanges(commandsDict.get('-address') or [])
+  if '-replay' in commandsDict:
+    done = replay(path[0], ranges)
+  else:
+    done = printSteps(path[0], ranges)
+  if not done:
+    sys.exit(1)